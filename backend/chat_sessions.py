@@ -0,0 +1,160 @@
+"""Server-side chat sessions: history kept once per conversation, older turns compacted into a rolling summary."""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+
+from .llm import build_prompt, llm_events
+from .retrieval import paper_header
+from .scheduler import INTERACTIVE, BACKGROUND
+from .tokens import estimate_tokens, fit_messages
+from . import prompts
+
+logger = logging.getLogger(__name__)
+
+# Verbatim turns kept per session; past this, the older half is folded into the summary
+CHAT_HISTORY_TOKENS = int(os.environ.get("PAPER_READER_HISTORY_TOKENS", "4000"))
+SESSION_TTL = float(os.environ.get("PAPER_READER_SESSION_TTL", "3600"))
+MAX_SESSIONS = 1000
+
+
+def _format(msg: dict) -> str:
+    role = "User" if msg["role"] == "user" else "Assistant"
+    return f"{role}: {msg['content']}"
+
+
+class ChatSession:
+    """One conversation about one paper.
+
+    The prompt prefix (instructions, paper header, summary, turns so far) is serialized once and only
+    appended to as turns complete, so a turn's prompt costs the same to build however long the chat is.
+    """
+
+    def __init__(self, paper: dict):
+        self.id = uuid.uuid4().hex
+        self.paper_id = paper["id"]
+        self.summary = ""
+        self.messages: list[dict] = []
+        self.touched = time.monotonic()
+        self._header = prompts.CHAT_SYSTEM.format(paper=paper_header(paper))
+        self._prefix: str | None = None
+        self._compacting = False
+
+    @property
+    def prefix(self) -> str:
+        if self._prefix is None:
+            parts = [self._header]
+            if self.summary:
+                parts.append(prompts.CHAT_SUMMARY.format(summary=self.summary))
+            parts.extend(_format(m) for m in self.messages)
+            self._prefix = "\n\n".join(parts)
+        return self._prefix
+
+    def last_question(self) -> str:
+        return next((m["content"] for m in reversed(self.messages) if m["role"] == "user"), "")
+
+    def prompt(self, context: str, question: str) -> str:
+        return f"{self.prefix}\n\n{prompts.CHAT_TURN.format(context=context, question=question)}"
+
+    def add_turn(self, question: str, answer: str):
+        turn = [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        self.messages.extend(turn)
+        if self._prefix is not None:
+            self._prefix += "".join(f"\n\n{_format(m)}" for m in turn)
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(m["content"], calibrated=True) for m in self.messages)
+
+    def needs_compaction(self) -> bool:
+        return not self._compacting and self.history_tokens() > CHAT_HISTORY_TOKENS
+
+    async def compact(self, client: str = "internal"):
+        """Fold all but the newest turns (about half the budget) into the summary."""
+        keep = fit_messages(self.messages, CHAT_HISTORY_TOKENS // 2)
+        if keep and keep[0]["role"] == "assistant":
+            keep = keep[1:]
+        old = self.messages[:len(self.messages) - len(keep)]
+        if not old:
+            return
+        self._compacting = True
+        try:
+            prompt = build_prompt(
+                prompts.COMPACT_SYSTEM,
+                prompts.COMPACT_USER.format(
+                    summary=self.summary or "(none)", transcript="\n\n".join(_format(m) for m in old)
+                ),
+            )
+            parts = []
+            async for event in llm_events(prompt, client, BACKGROUND):
+                if "token" in event:
+                    parts.append(event["token"])
+            # Turns added while the summary was being written stay in `messages`
+            self.summary = "".join(parts).strip()
+            del self.messages[:len(old)]
+            self._prefix = None
+            _stats["compactions"] += 1
+        except Exception as e:
+            logger.warning(f"Chat compaction failed for session {self.id}: {e}")
+        finally:
+            self._compacting = False
+
+
+_sessions: OrderedDict[str, ChatSession] = OrderedDict()
+_background: set[asyncio.Task] = set()
+_stats = {"created": 0, "compactions": 0}
+
+
+def _expire(now: float):
+    while _sessions and now - next(iter(_sessions.values())).touched > SESSION_TTL:
+        _sessions.popitem(last=False)
+
+
+def has_session(session_id: str, paper: dict) -> bool:
+    """Whether `session_id` is still live and about `paper` (sessions expire, are evicted, and die with the server)."""
+    _expire(time.monotonic())
+    session = _sessions.get(session_id)
+    return session is not None and session.paper_id == paper["id"]
+
+
+def open_session(paper: dict, session_id: str | None = None, history: list[dict] = ()) -> ChatSession:
+    """The session `session_id` if it is live and about `paper`, else a new one seeded with `history`."""
+    now = time.monotonic()
+    _expire(now)
+
+    session = _sessions.get(session_id) if session_id else None
+    if session is None or session.paper_id != paper["id"]:
+        session = ChatSession(paper)
+        session.messages = fit_messages(list(history), CHAT_HISTORY_TOKENS)
+        _sessions[session.id] = session
+        _stats["created"] += 1
+        if len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    session.touched = now
+    _sessions.move_to_end(session.id)
+    return session
+
+
+async def session_events(
+    session: ChatSession, question: str, context: str, client: str = "internal"
+) -> AsyncGenerator[dict, None]:
+    """{"session": id}, then llm_events() for the question. A completed answer is added to the session."""
+    yield {"session": session.id}
+    parts = []
+    async for event in llm_events(session.prompt(context, question), client, INTERACTIVE):
+        if "token" in event:
+            parts.append(event["token"])
+        yield event
+    session.add_turn(question, "".join(parts))
+    if session.needs_compaction():
+        # After the answer, so summarizing old turns never delays the reply
+        task = asyncio.ensure_future(session.compact(client))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+def session_stats() -> dict:
+    return {"sessions": len(_sessions), **_stats}
@@ -0,0 +1,165 @@
+"""Completion cache: finished LLM outputs keyed by (paper content hash, prompt template hash, model)."""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+from .llm import llm_events
+from .llm_backends import get_backend
+from .paper_store import DATA_DIR, STORE_BACKEND
+from .scheduler import INTERACTIVE
+from . import prompts
+
+logger = logging.getLogger(__name__)
+
+# kind -> the prompt parts that shape its output; editing any of them invalidates that kind
+TEMPLATES = {
+    "summary": (prompts.SUMMARIZE_SYSTEM, prompts.SUMMARIZE_USER),
+    "keypoints": (prompts.EXTRACT_SYSTEM, prompts.EXTRACT_USER),
+    "analysis": (prompts.ANALYZE_SYSTEM, prompts.ANALYZE_USER, *prompts.ANALYZE_CHANNELS),
+    "chunk": (prompts.MAP_SYSTEM, prompts.MAP_USER),
+}
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def template_hash(kind: str) -> str:
+    return content_hash("\x00".join(TEMPLATES[kind]))
+
+
+def model_id() -> str:
+    backend = get_backend()
+    return f"{backend.name}:{backend.model}"
+
+
+class CompletionCache:
+    """Completed generations in SQLite. Partial or failed generations are never stored.
+
+    Every method blocks on SQLite: call them off the event loop.
+    """
+
+    def __init__(self, path: Path | str):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "content_hash TEXT NOT NULL, template_hash TEXT NOT NULL, model TEXT NOT NULL, "
+            "kind TEXT NOT NULL, paper_id TEXT NOT NULL, text TEXT NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (content_hash, template_hash, model))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_paper ON completions (paper_id)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content: str, template: str, model: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text FROM completions WHERE content_hash = ? AND template_hash = ? AND model = ?",
+                (content, template, model),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, content: str, template: str, model: str, kind: str, paper_id: str, text: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(content_hash, template_hash, model, kind, paper_id, text, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content, template, model, kind, paper_id, text, time.time()),
+            )
+            self._db.commit()
+
+    def invalidate(self, paper_id: str | None = None, kind: str | None = None) -> int:
+        """Drop cached outputs for a paper and/or kind (everything if neither is given)."""
+        where, args = [], []
+        if paper_id is not None:
+            where.append("paper_id = ?")
+            args.append(paper_id)
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        sql = "DELETE FROM completions" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._lock:
+            deleted = self._db.execute(sql, args).rowcount
+            self._db.commit()
+        return deleted
+
+    def prune(self, current: dict[str, str]) -> int:
+        """Delete entries written under a template hash that is no longer current for their kind."""
+        deleted = 0
+        with self._lock:
+            for kind, digest in current.items():
+                deleted += self._db.execute(
+                    "DELETE FROM completions WHERE kind = ? AND template_hash != ?", (kind, digest)
+                ).rowcount
+            self._db.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: CompletionCache | None = None
+
+
+def get_completion_cache() -> CompletionCache:
+    global _cache
+    if _cache is None:
+        # Follow the paper store: cached outputs only outlive the process if papers do
+        _cache = CompletionCache(":memory:" if STORE_BACKEND == "memory" else DATA_DIR / "completions.db")
+        pruned = _cache.prune({kind: template_hash(kind) for kind in TEMPLATES})
+        if pruned:
+            logger.info(f"Dropped {pruned} cached completions from outdated prompts")
+    return _cache
+
+
+async def cached_llm_events(
+    kind: str,
+    paper_id: str,
+    context: str,
+    prompt: str,
+    client: str = "internal",
+    priority: int = INTERACTIVE,
+    refresh: bool = False,
+) -> AsyncGenerator[dict, None]:
+    """llm_events() for a `kind` of output over `context`, replayed from the cache when possible.
+
+    A hit yields the whole text as one {"token", "cached": True} event. A miss streams live and stores
+    the result once the generation finishes; `refresh` skips the lookup but still stores.
+    """
+    cache = get_completion_cache()
+    key = (content_hash(context), template_hash(kind), model_id())
+    if not refresh:
+        text = await asyncio.to_thread(cache.get, *key)
+        if text is not None:
+            yield {"token": text, "cached": True}
+            return
+
+    parts = []
+    async for event in llm_events(prompt, client, priority):
+        if "token" in event:
+            parts.append(event["token"])
+        yield event
+    await asyncio.to_thread(cache.put, *key, kind, paper_id, "".join(parts))
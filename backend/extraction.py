@@ -0,0 +1,127 @@
+"""Process pool for PDF parsing, so PyMuPDF never runs on the event loop."""
+
+import os
+import asyncio
+import logging
+import multiprocessing
+import resource
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = int(os.environ.get("PAPER_READER_PARSE_WORKERS", str(min(os.cpu_count() or 2, 8))))
+PARSE_TIMEOUT = float(os.environ.get("PAPER_READER_PARSE_TIMEOUT", "120"))
+PARSE_MEMORY_MB = int(os.environ.get("PAPER_READER_PARSE_MEMORY_MB", "2048"))
+# Recycle workers periodically so fragmented PyMuPDF heaps don't accumulate
+PARSE_MAX_TASKS = int(os.environ.get("PAPER_READER_PARSE_MAX_TASKS", "50"))
+
+_pool: ProcessPoolExecutor | None = None
+# Jobs submitted to the pool at once, so none sits in its queue while its timeout runs
+_slots: asyncio.Semaphore | None = None
+_slots_loop: asyncio.AbstractEventLoop | None = None
+
+
+# ===== Worker Side =====
+
+def _init_worker(memory_mb: int):
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _on_alarm(signum, frame):
+    raise TimeoutError("PDF parsing timed out")
+
+
+def _run_job(fn, timeout: float, *args):
+    """Run fn(*args) in the worker, interrupting it with SIGALRM after `timeout` seconds."""
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# ===== Pool =====
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(PARSE_MEMORY_MB,),
+            max_tasks_per_child=PARSE_MAX_TASKS,
+        )
+        logger.info(f"PDF parse pool: {PARSE_WORKERS} workers, {PARSE_TIMEOUT:.0f}s timeout, {PARSE_MEMORY_MB} MB limit")
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _restart_pool(pool: ProcessPoolExecutor):
+    """Kill `pool`'s workers and drop it, so the next job gets a fresh pool.
+
+    shutdown() alone would leave a worker stuck in MuPDF's C code (where SIGALRM can't reach it)
+    holding its slot forever. Jobs still running on `pool` fail with BrokenProcessPool.
+    """
+    global _pool
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+    if _pool is pool:
+        _pool = None
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots, _slots_loop = asyncio.Semaphore(PARSE_WORKERS), loop
+    return _slots
+
+
+async def run_in_pool(fn, *args, timeout: float = PARSE_TIMEOUT):
+    """Run a picklable top-level function in the parse pool and await its result.
+
+    Jobs beyond PARSE_WORKERS wait here rather than in the pool's queue, so `timeout` counts only
+    time spent parsing: a job that merely queued behind others never trips the hung-worker backstop.
+    """
+    async with _get_slots():
+        return await _run_submitted(fn, *args, timeout=timeout)
+
+
+async def _run_submitted(fn, *args, timeout: float):
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    future = loop.run_in_executor(pool, _run_job, fn, timeout, *args)
+    try:
+        # The worker enforces the timeout itself; the outer wait is a backstop for a hung worker
+        done, _ = await asyncio.wait([future], timeout=timeout + 10)
+        if not done:
+            logger.error(f"PDF parse worker hung for {timeout + 10:.0f}s, restarting the pool")
+            _restart_pool(pool)
+            raise ValueError(f"PDF parsing timed out after {timeout:.0f}s")
+        return future.result()
+    except TimeoutError:
+        raise ValueError(f"PDF parsing timed out after {timeout:.0f}s")
+    except MemoryError:
+        raise ValueError(f"PDF needs more than {PARSE_MEMORY_MB} MB to parse")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed by the OS, or by _restart_pool); start a fresh pool for the next job
+        logger.error("PDF parse pool broke, restarting it")
+        _restart_pool(pool)
+        raise RuntimeError("PDF parser crashed")
+    finally:
+        # Timed out or cancelled: nobody will read this result
+        future.cancel()
@@ -0,0 +1,55 @@
+"""Application-lifetime httpx client shared by all outbound fetches (keep-alive, optional HTTP/2)."""
+
+import os
+import asyncio
+import logging
+import importlib.util
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("PAPER_READER_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("PAPER_READER_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_PER_HOST = int(os.environ.get("PAPER_READER_HTTP_PER_HOST", "8"))
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+HTTP2 = os.environ.get("PAPER_READER_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+_client: httpx.AsyncClient | None = None
+_host_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client. Created by the app lifespan, or lazily when used outside the app."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=30,
+            follow_redirects=True,
+            max_redirects=10,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            headers={"User-Agent": "paper-reader"},
+        )
+        logger.info(f"HTTP client: http2={HTTP2}, {HTTP_MAX_CONNECTIONS} connections, {HTTP_PER_HOST} per host")
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def host_slot(url: str):
+    """Hold one of the HTTP_PER_HOST request slots for the host of `url`."""
+    host = urlsplit(url).netloc.lower()
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(HTTP_PER_HOST)
+    async with slot:
+        yield
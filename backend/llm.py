@@ -1,96 +1,121 @@
-import asyncio
-import json
-import os
-import pty
-import re
 from collections.abc import AsyncGenerator
 
-
-def _clean_env() -> dict:
-    env = os.environ.copy()
-    env.pop("CLAUDECODE", None)
-    return env
-
-
-MODEL = os.environ.get("PAPER_READER_MODEL", "claude-haiku-4-5-20251001")
+from .llm_backends import get_backend
+from .scheduler import get_scheduler, INTERACTIVE
+from .tokens import estimate_tokens, truncate_to_tokens
 
 
 def chunk_text(text: str, max_tokens: int = 12000) -> list[str]:
-    max_chars = max_tokens * 4
-    if len(text) <= max_chars:
+    """Split `text` at paragraph boundaries into chunks of at most `max_tokens` (estimated)."""
+    if estimate_tokens(text) <= max_tokens:
         return [text]
     chunks = []
-    paragraphs = text.split("\n\n")
-    current = ""
-    for para in paragraphs:
-        if len(current) + len(para) > max_chars and current:
-            chunks.append(current.strip())
-            current = ""
-        current += para + "\n\n"
-    if current.strip():
-        chunks.append(current.strip())
+    current, used = [], 0
+    for para in text.split("\n\n"):
+        cost = estimate_tokens(para) + 1
+        if current and used + cost > max_tokens:
+            chunks.append("\n\n".join(current).strip())
+            current, used = [], 0
+        # A paragraph that alone exceeds the budget (e.g. a long table) is cut into pieces
+        while cost > max_tokens:
+            head = truncate_to_tokens(para, max_tokens) or para[:1]
+            chunks.append(head.strip())
+            para = para[len(head):]
+            cost = estimate_tokens(para) + 1
+        current.append(para)
+        used += cost
+    if "".join(current).strip():
+        chunks.append("\n\n".join(current).strip())
     return chunks
 
 
-def get_paper_context(paper: dict, max_tokens: int = 24000) -> str:
+def paper_text(paper: dict) -> str:
+    """The whole paper as markdown: abstract, then every section."""
     text = ""
     if paper.get("abstract"):
         text += f"Abstract: {paper['abstract']}\n\n"
     for s in paper.get("sections", []):
         text += f"## {s['heading']}\n{s['content']}\n\n"
-    chunks = chunk_text(text, max_tokens)
-    return chunks[0] if chunks else text[:max_tokens * 4]
-
-
-def _strip_ansi(text: str) -> str:
-    text = re.sub(r'\x1b\[[0-9;]*[a-zA-Z]', '', text)
-    text = re.sub(r'\x1b\][^\x07]*\x07', '', text)
-    text = re.sub(r'\x1b[()][AB012]', '', text)
-    text = text.replace('\r', '')
     return text
 
 
-async def stream_claude(prompt: str) -> AsyncGenerator[str, None]:
-    """Run claude -p with PTY for real-time streaming. Uses --allowedTools '' to skip MCP loading."""
-    master_fd, slave_fd = pty.openpty()
+def build_prompt(system: str, user: str) -> str:
+    return f"{system}\n\n---\n\n{user}"
 
-    proc = await asyncio.create_subprocess_exec(
-        "claude", "-p", prompt,
-        "--model", MODEL,
-        "--allowedTools", "",
-        stdout=slave_fd,
-        stderr=asyncio.subprocess.PIPE,
-        env=_clean_env(),
-    )
-    os.close(slave_fd)
 
-    loop = asyncio.get_event_loop()
+async def llm_events(prompt: str, client: str = "internal", priority: int = INTERACTIVE) -> AsyncGenerator[dict, None]:
+    """Wait for a scheduler slot, then stream the completion.
+
+    Yields {"queue": position} while waiting and {"token": text} while generating.
+    """
+    ticket = get_scheduler().ticket(client, priority)
     try:
+        async for position in ticket.positions():
+            yield {"queue": position}
+        async for text in get_backend().stream(prompt):
+            yield {"token": text}
+    finally:
+        ticket.release()
+
+
+class ChannelSplitter:
+    """Splits one streamed completion into channels, each introduced by a marker (see ANALYZE_CHANNELS).
+
+    Text before the first marker goes to the first channel, so a reply without markers still lands somewhere.
+    """
+
+    def __init__(self, markers: dict[str, str]):
+        self.markers = markers
+        self.channel = next(iter(markers.values()))
+        self._buffer = ""
+        self._fresh = True  # strip the newline(s) that follow a marker
+
+    def _emit(self, text: str, out: list[tuple[str, str]]):
+        if self._fresh:
+            text = text.lstrip()
+            self._fresh = not text
+        if text:
+            out.append((self.channel, text))
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """Return the (channel, text) pieces that are certain; a possible partial marker is held back."""
+        out = []
+        self._buffer += text
         while True:
-            try:
-                data = await asyncio.wait_for(
-                    loop.run_in_executor(None, os.read, master_fd, 4096),
-                    timeout=1.0,
-                )
-                if not data:
-                    break
-                text = _strip_ansi(data.decode("utf-8", errors="replace"))
-                if text:
-                    yield text
-            except asyncio.TimeoutError:
-                if proc.returncode is not None:
-                    break
-            except OSError:
+            found = [(self._buffer.find(m), m) for m in self.markers if m in self._buffer]
+            if not found:
                 break
-    finally:
-        try:
-            os.close(master_fd)
-        except OSError:
-            pass
-        await proc.wait()
-
-    if proc.returncode != 0:
-        stderr = await proc.stderr.read()
-        err_msg = stderr.decode("utf-8", errors="replace").strip()
-        if err_msg:
-            yield f"\n\n[Error: {err_msg}]"
+            idx, marker = min(found)
+            self._emit(self._buffer[:idx], out)
+            self._buffer = self._buffer[idx + len(marker):]
+            self.channel = self.markers[marker]
+            self._fresh = True
+        # Keep the longest tail that could still grow into a marker
+        hold = max(
+            (n for m in self.markers for n in range(1, len(m)) if self._buffer.endswith(m[:n])),
+            default=0,
+        )
+        self._emit(self._buffer[:len(self._buffer) - hold], out)
+        self._buffer = self._buffer[len(self._buffer) - hold:]
+        return out
+
+    def finish(self) -> list[tuple[str, str]]:
+        out = []
+        self._emit(self._buffer, out)
+        self._buffer = ""
+        return out
+
+
+async def split_channels(events: AsyncGenerator[dict, None], markers: dict[str, str]) -> AsyncGenerator[dict, None]:
+    """Demultiplex the {"token"} events of a marker-delimited completion into {"channel", "token"} events."""
+    splitter = ChannelSplitter(markers)
+    last = {}
+    async for event in events:
+        if "token" not in event:
+            yield event
+            continue
+        last = event
+        for channel, text in splitter.feed(event["token"]):
+            yield {**event, "channel": channel, "token": text}
+    for channel, text in splitter.finish():
+        yield {**last, "channel": channel, "token": text}
@@ -0,0 +1,403 @@
+"""LLM backends behind llm_events: the claude CLI, the Anthropic HTTP API, and an offline fake."""
+
+import asyncio
+import codecs
+import json
+import os
+import pty
+import re
+import signal
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncGenerator
+
+import httpx
+
+from .http_client import get_client
+from .tokens import calibrate
+
+MODEL = os.environ.get("PAPER_READER_MODEL", "claude-haiku-4-5-20251001")
+LLM_BACKEND = os.environ.get("PAPER_READER_LLM_BACKEND", "cli")
+
+
+def _clean_env() -> dict:
+    env = os.environ.copy()
+    env.pop("CLAUDECODE", None)
+    return env
+
+
+class LLMBackend(ABC):
+    """Streams completions for a prompt. Subclasses implement stream(); start/close/stats are optional."""
+
+    name = "base"
+
+    def __init__(self, model: str = MODEL):
+        self.model = model
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model}
+
+
+# ===== CLI Backend =====
+
+def _strip_ansi(text: str) -> str:
+    text = re.sub(r'\x1b\[[0-9;]*[a-zA-Z]', '', text)
+    text = re.sub(r'\x1b\][^\x07]*\x07', '', text)
+    text = re.sub(r'\x1b[()][AB012]', '', text)
+    text = text.replace('\r', '')
+    return text
+
+
+LLM_POOL_SIZE = int(os.environ.get("PAPER_READER_LLM_POOL_SIZE", "2"))
+# Idle workers older than this are replaced, so a stale CLI session never serves a request
+LLM_WORKER_TTL = float(os.environ.get("PAPER_READER_LLM_WORKER_TTL", "300"))
+LLM_HEALTH_INTERVAL = 30
+
+
+class ClaudeWorker:
+    """A `claude -p` process started ahead of time, idling until its prompt arrives on stdin."""
+
+    def __init__(self, proc, master_fd: int):
+        self.proc = proc
+        self.master_fd = master_fd
+        self.started = time.monotonic()
+        self._fd_closed = False
+
+    @classmethod
+    async def spawn(cls, model: str = MODEL) -> "ClaudeWorker":
+        master_fd, slave_fd = pty.openpty()
+        proc = await asyncio.create_subprocess_exec(
+            "claude", "-p",
+            "--model", model,
+            "--allowedTools", "",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=slave_fd,
+            stderr=asyncio.subprocess.PIPE,
+            env=_clean_env(),
+            start_new_session=True,  # own process group, so kill() also reaps anything the CLI started
+        )
+        os.close(slave_fd)
+        return cls(proc, master_fd)
+
+    def healthy(self) -> bool:
+        return self.proc.returncode is None and time.monotonic() - self.started < LLM_WORKER_TTL
+
+    def _close_fd(self):
+        # Exactly once: a second close could hit an unrelated file that another thread opened under the same number
+        if self._fd_closed:
+            return
+        self._fd_closed = True
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self._close_fd()
+
+    async def run(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Send the prompt (stdin, then EOF) and stream the answer from the PTY."""
+        proc, master_fd = self.proc, self.master_fd
+        # Multi-byte characters (e.g. CJK) can straddle two reads
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            proc.stdin.write(prompt.encode())
+            await proc.stdin.drain()
+            proc.stdin.close()
+
+            async for data in _read_fd(master_fd):
+                text = _strip_ansi(decoder.decode(data))
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+        except BaseException:
+            # Client went away or the read failed: don't leave the CLI running
+            self.kill()
+            raise
+        finally:
+            self._close_fd()
+            await proc.wait()
+
+        if proc.returncode != 0:
+            # Raise rather than append to the answer, so a failed run is never cached as output
+            stderr = await proc.stderr.read()
+            err_msg = stderr.decode("utf-8", errors="replace").strip()
+            raise RuntimeError(err_msg or f"claude exited with status {proc.returncode}")
+
+
+async def _read_fd(fd: int) -> AsyncGenerator[bytes, None]:
+    """Read a file descriptor until EOF on the event loop itself: no executor threads, no polling timeout."""
+    loop = asyncio.get_running_loop()
+    os.set_blocking(fd, False)
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            readable = loop.create_future()
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fd)
+            continue
+        except OSError:
+            # EIO: the child closed its side of the PTY
+            return
+        if not data:
+            return
+        yield data
+
+
+class WorkerPool:
+    """Keeps `size` workers spawned ahead of demand. Requests take ready workers in FIFO order."""
+
+    def __init__(self, size: int, model: str = MODEL):
+        self.size = size
+        self.model = model
+        # Ready workers, plus spawn errors queued to wake a waiter (see _spawn_one)
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._idle = 0  # workers (not errors) in _ready
+        self._spawning = 0
+        self._health_task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = {"warm": 0, "cold": 0, "discarded": 0, "spawnErrors": 0}
+
+    def _replenish(self):
+        while self._idle + self._spawning < self.size:
+            self._spawning += 1
+            asyncio.ensure_future(self._spawn_one())
+
+    async def _spawn_one(self):
+        try:
+            worker = await ClaudeWorker.spawn(self.model)
+        except Exception as e:
+            # Wake whoever is waiting instead of leaving them hanging; errors don't count toward `size`
+            self.stats["spawnErrors"] += 1
+            worker = e
+        finally:
+            self._spawning -= 1
+        if isinstance(worker, ClaudeWorker):
+            if self._closed:
+                worker.kill()
+                return
+            self._idle += 1
+        self._ready.put_nowait(worker)
+
+    def _take(self, item):
+        if isinstance(item, ClaudeWorker):
+            self._idle -= 1
+        return item
+
+    def start(self):
+        if self.size > 0:
+            self._replenish()
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def _health_loop(self):
+        """Periodically replace idle workers that exited or outlived LLM_WORKER_TTL."""
+        while True:
+            await asyncio.sleep(LLM_HEALTH_INTERVAL)
+            idle = []
+            while not self._ready.empty():
+                idle.append(self._take(self._ready.get_nowait()))
+            for worker in idle:
+                if not isinstance(worker, ClaudeWorker):
+                    continue  # a stale spawn error nobody was waiting for
+                if worker.healthy():
+                    self._idle += 1
+                    self._ready.put_nowait(worker)
+                else:
+                    self.stats["discarded"] += 1
+                    worker.kill()
+            self._replenish()
+
+    async def acquire(self) -> ClaudeWorker:
+        if self.size <= 0:
+            self.stats["cold"] += 1
+            return await ClaudeWorker.spawn(self.model)
+        while True:
+            warm = not self._ready.empty()
+            self._replenish()
+            worker = self._take(await self._ready.get())
+            self._replenish()
+            if isinstance(worker, Exception):
+                # Possibly stale (claude was briefly missing): only fail if spawning now fails too
+                self.stats["cold"] += 1
+                return await ClaudeWorker.spawn(self.model)
+            if worker.healthy():
+                self.stats["warm" if warm else "cold"] += 1
+                return worker
+            self.stats["discarded"] += 1
+            worker.kill()
+
+    async def close(self):
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+        while not self._ready.empty():
+            worker = self._take(self._ready.get_nowait())
+            if isinstance(worker, ClaudeWorker):
+                worker.kill()
+                await worker.proc.wait()
+
+
+class CLIBackend(LLMBackend):
+    """`claude -p` through a pool of pre-started workers."""
+
+    name = "cli"
+
+    def __init__(self, model: str = MODEL, pool_size: int = LLM_POOL_SIZE):
+        super().__init__(model)
+        self.pool = WorkerPool(pool_size, model)
+
+    async def start(self):
+        self.pool.start()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        worker = await self.pool.acquire()
+        async for text in worker.run(prompt):
+            yield text
+
+    def stats(self) -> dict:
+        return {**super().stats(), "workers": self.pool.stats}
+
+
+# ===== HTTP Backend =====
+
+ANTHROPIC_API_URL = os.environ.get("PAPER_READER_API_URL", "https://api.anthropic.com/v1/messages")
+LLM_MAX_TOKENS = int(os.environ.get("PAPER_READER_MAX_TOKENS", "4096"))
+
+
+class HTTPBackend(LLMBackend):
+    """The Anthropic Messages API with `stream: true`, over the shared pooled httpx client."""
+
+    name = "http"
+
+    def __init__(self, model: str = MODEL, api_key: str | None = None, url: str = ANTHROPIC_API_URL):
+        super().__init__(model)
+        self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY", "")
+        self.url = url
+
+    async def start(self):
+        if not self.api_key:
+            raise RuntimeError("PAPER_READER_LLM_BACKEND=http needs ANTHROPIC_API_KEY")
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+        body = {
+            "model": self.model,
+            "max_tokens": LLM_MAX_TOKENS,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        timeout = httpx.Timeout(30, read=120)
+        async with get_client().stream("POST", self.url, json=body, headers=headers, timeout=timeout) as resp:
+            if resp.status_code != 200:
+                detail = (await resp.aread()).decode("utf-8", errors="replace")
+                raise RuntimeError(f"LLM API error {resp.status_code}: {detail[:500]}")
+            async for event, data in parse_sse(resp.aiter_lines()):
+                if event == "message_start":
+                    # The API counts the prompt exactly; use it to keep our estimates honest
+                    calibrate(prompt, data.get("message", {}).get("usage", {}).get("input_tokens", 0))
+                elif event == "content_block_delta" and data.get("delta", {}).get("type") == "text_delta":
+                    yield data["delta"]["text"]
+                elif event == "error":
+                    raise RuntimeError(data.get("error", {}).get("message", "LLM API error"))
+                elif event == "message_stop":
+                    break
+
+
+async def parse_sse(lines) -> AsyncGenerator[tuple[str, dict], None]:
+    """Parse a server-sent event stream into (event name, JSON data) pairs."""
+    event, data = "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+    if data:
+        yield event, json.loads("\n".join(data))
+
+
+# ===== Fake Backend =====
+
+FAKE_DELAY_MS = float(os.environ.get("PAPER_READER_FAKE_DELAY_MS", "5"))
+
+
+class FakeBackend(LLMBackend):
+    """Offline, deterministic stand-in: streams a canned markdown answer word by word."""
+
+    name = "fake"
+
+    def __init__(self, model: str = "fake", delay_ms: float = FAKE_DELAY_MS, first_token_ms: float = 0):
+        super().__init__(model)
+        self.delay = delay_ms / 1000
+        self.first_token_delay = first_token_ms / 1000
+
+    def respond(self, prompt: str) -> str:
+        first_line = next((line for line in prompt.splitlines() if line.strip()), "")
+        return (
+            f"## Fake response\n\n"
+            f"- Prompt: {len(prompt)} characters\n"
+            f"- First line: {first_line[:80]}\n"
+        )
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        await asyncio.sleep(self.first_token_delay)
+        for word in re.findall(r'\S+\s*', self.respond(prompt)):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word
+
+
+BACKENDS = {"cli": CLIBackend, "http": HTTPBackend, "fake": FakeBackend}
+
+_backend: LLMBackend | None = None
+
+
+def get_backend() -> LLMBackend:
+    """The backend selected by PAPER_READER_LLM_BACKEND (cli, http or fake)."""
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown PAPER_READER_LLM_BACKEND: {LLM_BACKEND} (expected one of {', '.join(BACKENDS)})")
+        _backend = BACKENDS[LLM_BACKEND]()
+    return _backend
+
+
+async def start_backend():
+    await get_backend().start()
+
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
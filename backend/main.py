@@ -1,40 +1,69 @@
+import asyncio
 import json
 import logging
 import traceback
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, Response, StreamingResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from .models import LoadRequest, SummarizeRequest, ExtractRequest, TranslateRequest, ChatRequest
-from .paper_ingestion import load_paper, get_paper
-from .llm import stream_claude, get_paper_context
-from .translator import translate_sections
+from .models import LoadRequest, BatchLoadRequest, SummarizeRequest, ExtractRequest, AnalyzeRequest, TranslateRequest, ChatRequest
+from .paper_ingestion import load_paper, load_papers, load_paper_events, load_timing_stats, get_paper, get_pdf_path, get_pdf_bytes
+from .paper_store import get_store
+from .llm import split_channels
+from .retrieval import retrieve_context
+from .chat_sessions import has_session, open_session, session_events, session_stats
+from .llm_backends import get_backend, start_backend, close_backend
+from .translator import get_engine, translate_headings, translate_sections, shutdown_translator
+from .translation_memory import get_translation_memory
+from .extraction import shutdown_pool
+from .http_client import get_client, close_client
+from .scheduler import get_scheduler, BACKGROUND
+from .completion_cache import get_completion_cache
+from .map_reduce import map_reduce_events
 from . import prompts
 
-app = FastAPI(title="Paper Reader")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_client()
+    get_completion_cache()
+    await start_backend()
+    yield
+    await close_backend()
+    await close_client()
+    shutdown_pool()
+    shutdown_translator()
+
+
+app = FastAPI(title="Paper Reader", lifespan=lifespan)
 
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
 
 
 # ===== SSE helpers =====
 
-async def sse_from_claude(prompt: str):
+async def sse_from_events(events):
+    """Relay LLM events ({"queue"}, {"token"} and extras such as {"map"} or {"session"}) as SSE."""
     try:
-        async for token in stream_claude(prompt):
-            yield f"data: {json.dumps({'token': token})}\n\n"
+        async for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
         yield "data: [DONE]\n\n"
     except Exception as e:
         yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
 
-async def sse_from_translator(sections, target_lang):
-    """Translate sections via Google Translate, streaming each as SSE."""
+async def sse_from_translator(sections, target_lang, engine, client: str = "internal"):
+    """Translate sections with `engine`: the translated outline first, then each section as SSE."""
     try:
-        for heading, translated in translate_sections(sections, target_lang):
+        outline = await translate_headings([s["heading"] for s in sections], target_lang, engine=engine, client=client)
+        yield f"data: {json.dumps({'outline': outline})}\n\n"
+        translated_sections = translate_sections(sections, target_lang, headings=outline, engine=engine, client=client)
+        async for heading, translated in translated_sections:
             chunk = f"## {heading}\n\n{translated}\n\n"
             yield f"data: {json.dumps({'token': chunk, 'section': heading})}\n\n"
         yield "data: [DONE]\n\n"
@@ -43,8 +72,50 @@ async def sse_from_translator(sections, target_lang):
         yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
 
-def build_prompt(system: str, user: str) -> str:
-    return f"{system}\n\n---\n\n{user}"
+async def sse_from_load(url: str):
+    """Stream load progress: metadata, then sections as pages are parsed, then the loaded paper."""
+    try:
+        async for event in load_paper_events(url):
+            if "paper" in event:
+                event = {"paper": paper_response(event["paper"])}
+            yield f"data: {json.dumps(event)}\n\n"
+        yield "data: [DONE]\n\n"
+    except ValueError as e:
+        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    except Exception as e:
+        logger.error(f"Load paper error: {traceback.format_exc()}")
+        yield f"data: {json.dumps({'error': f'Failed to load paper: {e}'})}\n\n"
+
+
+async def sse_from_batch(urls: list[str]):
+    """Stream a batch load: {"total"}, then one result per URL as it finishes, in completion order."""
+    try:
+        yield f"data: {json.dumps({'total': len(urls)})}\n\n"
+        async for r in load_papers(urls):
+            if "paper" in r:
+                paper = r.pop("paper")
+                r.update(id=paper["id"], title=paper["title"], authors=paper["authors"], numPages=paper["numPages"])
+            yield f"data: {json.dumps(r)}\n\n"
+        yield "data: [DONE]\n\n"
+    except Exception as e:
+        logger.error(f"Batch load error: {traceback.format_exc()}")
+        yield f"data: {json.dumps({'error': f'Failed to load papers: {e}'})}\n\n"
+
+
+def paper_response(paper: dict) -> dict:
+    return {
+        "id": paper["id"],
+        "title": paper["title"],
+        "authors": paper["authors"],
+        "abstract": paper["abstract"],
+        "numPages": paper["numPages"],
+        "sections": [{"heading": s["heading"], "content": s["content"]} for s in paper["sections"]],
+    }
+
+
+def client_id(request: Request) -> str:
+    """Who to queue an LLM request under: the browser's X-Client-Id, else its address."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
 
 
 # ===== API Routes =====
@@ -53,14 +124,7 @@ def build_prompt(system: str, user: str) -> str:
 async def api_load_paper(req: LoadRequest):
     try:
         paper = await load_paper(req.url)
-        return {
-            "id": paper["id"],
-            "title": paper["title"],
-            "authors": paper["authors"],
-            "abstract": paper["abstract"],
-            "numPages": paper["numPages"],
-            "sections": [{"heading": s["heading"], "content": s["content"]} for s in paper["sections"]],
-        }
+        return paper_response(paper)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -68,62 +132,133 @@ async def api_load_paper(req: LoadRequest):
         raise HTTPException(status_code=500, detail=f"Failed to load paper: {e}")
 
 
+@app.post("/api/paper/load/stream")
+async def api_load_paper_stream(req: LoadRequest):
+    return StreamingResponse(sse_from_load(req.url), media_type="text/event-stream")
+
+
+MAX_BATCH_URLS = 500
+
+
+@app.post("/api/papers/load-batch")
+async def api_load_papers(req: BatchLoadRequest):
+    """Load a reading list. Streams each paper's result as it finishes rather than waiting for all of them."""
+    if len(req.urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs per batch")
+    return StreamingResponse(sse_from_batch(req.urls), media_type="text/event-stream")
+
+
 @app.get("/api/paper/{paper_id}/pdf")
-async def api_get_pdf(paper_id: str):
-    paper = get_paper(paper_id)
-    if not paper or "pdf_bytes" not in paper:
+async def api_get_pdf(paper_id: str, request: Request):
+    paper = await get_paper(paper_id)
+    if not paper or not paper.get("pdf_sha256"):
+        raise HTTPException(status_code=404, detail="PDF not found")
+
+    # Blobs are content-addressed, so the hash is a strong validator. The URL is not: a paper id can be
+    # stored again with a different PDF, so browsers revalidate (a cheap 304) instead of caching forever
+    etag = f'"{paper["pdf_sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse streams from disk and answers Range / If-Range itself, so PDF.js can load ranges
+    path = await get_pdf_path(paper)
+    if path:
+        return FileResponse(path, media_type="application/pdf", headers=headers)
+
+    pdf_bytes = await get_pdf_bytes(paper)
+    if pdf_bytes is None:
         raise HTTPException(status_code=404, detail="PDF not found")
-    return Response(content=paper["pdf_bytes"], media_type="application/pdf")
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+
+@app.get("/api/stats")
+async def api_stats():
+    return {
+        "store": await asyncio.to_thread(get_store().stats),
+        "loads": load_timing_stats(),
+        "llm": get_backend().stats(),
+        "scheduler": get_scheduler().stats(),
+        "completions": await asyncio.to_thread(get_completion_cache().stats),
+        "chat": session_stats(),
+        "translations": get_translation_memory().stats(),
+    }
 
 
 @app.post("/api/paper/summarize")
-async def api_summarize(req: SummarizeRequest):
-    paper = get_paper(req.paper_id)
+async def api_summarize(req: SummarizeRequest, request: Request):
+    paper = await get_paper(req.paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
-    context = get_paper_context(paper)
-    prompt = build_prompt(prompts.SUMMARIZE_SYSTEM, prompts.SUMMARIZE_USER.format(text=context))
-    return StreamingResponse(sse_from_claude(prompt), media_type="text/event-stream")
+    events = map_reduce_events(
+        "summary", paper, prompts.SUMMARIZE_SYSTEM, prompts.SUMMARIZE_USER, client_id(request), BACKGROUND, req.refresh
+    )
+    return StreamingResponse(sse_from_events(events), media_type="text/event-stream")
 
 
 @app.post("/api/paper/extract")
-async def api_extract(req: ExtractRequest):
-    paper = get_paper(req.paper_id)
+async def api_extract(req: ExtractRequest, request: Request):
+    paper = await get_paper(req.paper_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found.")
+    events = map_reduce_events(
+        "keypoints", paper, prompts.EXTRACT_SYSTEM, prompts.EXTRACT_USER, client_id(request), BACKGROUND, req.refresh
+    )
+    return StreamingResponse(sse_from_events(events), media_type="text/event-stream")
+
+
+@app.post("/api/paper/analyze")
+async def api_analyze(req: AnalyzeRequest, request: Request):
+    """Summary and key points from one LLM call, streamed as events tagged "summary" / "keypoints"."""
+    paper = await get_paper(req.paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
-    context = get_paper_context(paper)
-    prompt = build_prompt(prompts.EXTRACT_SYSTEM, prompts.EXTRACT_USER.format(text=context))
-    return StreamingResponse(sse_from_claude(prompt), media_type="text/event-stream")
+    events = map_reduce_events(
+        "analysis", paper, prompts.ANALYZE_SYSTEM, prompts.ANALYZE_USER, client_id(request), BACKGROUND, req.refresh
+    )
+    return StreamingResponse(
+        sse_from_events(split_channels(events, prompts.ANALYZE_CHANNELS)), media_type="text/event-stream"
+    )
+
+
+@app.delete("/api/paper/{paper_id}/cache")
+async def api_clear_cache(paper_id: str):
+    """Forget cached summaries, key points and analyses for a paper, so the next request regenerates them."""
+    return {"deleted": await asyncio.to_thread(get_completion_cache().invalidate, paper_id=paper_id)}
 
 
 @app.post("/api/paper/translate")
-async def api_translate(req: TranslateRequest):
-    paper = get_paper(req.paper_id)
+async def api_translate(req: TranslateRequest, request: Request):
+    paper = await get_paper(req.paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
 
     lang_map = {"zh": "zh-CN", "en": "en"}
     target = lang_map.get(req.target_lang, "zh-CN")
+    try:
+        engine = get_engine(req.engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return StreamingResponse(
-        sse_from_translator(paper["sections"], target),
+        sse_from_translator(paper["sections"], target, engine, client_id(request)),
         media_type="text/event-stream",
     )
 
 
 @app.post("/api/paper/chat")
-async def api_chat(req: ChatRequest):
-    paper = get_paper(req.paper_id)
+async def api_chat(req: ChatRequest, request: Request):
+    paper = await get_paper(req.paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found.")
-    context = get_paper_context(paper, max_tokens=20000)
-    parts = [prompts.CHAT_SYSTEM.format(context=context)]
-    for msg in req.history[-10:]:
-        role = "User" if msg["role"] == "user" else "Assistant"
-        parts.append(f"{role}: {msg['content']}")
-    parts.append(f"User: {req.question}")
-    parts.append("Assistant:")
-    return StreamingResponse(sse_from_claude("\n\n".join(parts)), media_type="text/event-stream")
+    if req.session_id and not req.history and not has_session(req.session_id, paper):
+        # Expired, evicted or lost in a restart: the client resends its history to rebuild it
+        raise HTTPException(status_code=409, detail="Chat session expired.")
+    session = open_session(paper, req.session_id, req.history)
+    # Follow-ups ("what about its limits?") lean on the previous question for their subject
+    context = await asyncio.to_thread(retrieve_context, paper, f"{req.question} {session.last_question()}")
+    events = session_events(session, req.question, context, client_id(request))
+    return StreamingResponse(sse_from_events(events), media_type="text/event-stream")
 
 
 # ===== Serve Frontend =====
@@ -0,0 +1,71 @@
+"""Map-reduce for long papers: notes on every chunk (concurrent, cached per chunk), then one pass over the notes."""
+
+import asyncio
+import os
+from collections.abc import AsyncGenerator
+
+from .completion_cache import cached_llm_events
+from .llm import build_prompt, chunk_text, paper_text
+from .scheduler import BACKGROUND
+from .tokens import estimate_tokens
+from . import prompts
+
+# Papers up to this size are sent whole; longer ones are split into MAP_CHUNK_TOKENS chunks
+DIRECT_MAX_TOKENS = int(os.environ.get("PAPER_READER_DIRECT_MAX_TOKENS", "24000"))
+MAP_CHUNK_TOKENS = int(os.environ.get("PAPER_READER_MAP_CHUNK_TOKENS", "12000"))
+
+
+async def chunk_notes(paper_id: str, chunk: str, client: str = "internal") -> str:
+    """Notes on one chunk. Cached by the chunk's content, so an unchanged chunk is never sent twice."""
+    prompt = build_prompt(prompts.MAP_SYSTEM, prompts.MAP_USER.format(text=chunk))
+    parts = []
+    async for event in cached_llm_events("chunk", paper_id, chunk, prompt, client, BACKGROUND):
+        if "token" in event:
+            parts.append(event["token"])
+    return "".join(parts)
+
+
+async def map_reduce_events(
+    kind: str,
+    paper: dict,
+    system: str,
+    user: str,
+    client: str = "internal",
+    priority: int = BACKGROUND,
+    refresh: bool = False,
+) -> AsyncGenerator[dict, None]:
+    """cached_llm_events() for `kind` over the whole paper, however long it is.
+
+    Short papers go straight to the model. Long ones are mapped to notes chunk by chunk, streaming
+    {"map": {"done", "total", "index", "notes"}} as each chunk finishes (in any order; `index` is the
+    chunk's place in the paper), and the notes are then reduced with `system`/`user`.
+    `refresh` regenerates the final pass only; chunk notes are reused whenever their chunk is unchanged.
+    """
+    text = paper_text(paper)
+    if estimate_tokens(text) <= DIRECT_MAX_TOKENS:
+        context = text
+    else:
+        chunks = chunk_text(text, MAP_CHUNK_TOKENS)
+        # Every chunk is queued at once; the scheduler decides how many actually run
+        tasks = [asyncio.ensure_future(chunk_notes(paper["id"], chunk, client)) for chunk in chunks]
+        try:
+            yield {"map": {"done": 0, "total": len(tasks)}}
+            pending = {task: i for i, task in enumerate(tasks)}
+            done = 0
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(finished, key=pending.get):
+                    done += 1
+                    index = pending.pop(task)
+                    yield {"map": {"done": done, "total": len(tasks), "index": index, "notes": task.result()}}
+            notes = [task.result() for task in tasks]
+        finally:
+            for task in tasks:
+                task.cancel()
+        context = "\n\n".join(
+            f"### Part {i} of {len(notes)}\n{note.strip()}" for i, note in enumerate(notes, start=1)
+        )
+
+    prompt = build_prompt(system, user.format(text=context))
+    async for event in cached_llm_events(kind, paper["id"], context, prompt, client, priority, refresh):
+        yield event
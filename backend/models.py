@@ -3,17 +3,28 @@ from pydantic import BaseModel
 class LoadRequest(BaseModel):
     url: str
 
+class BatchLoadRequest(BaseModel):
+    urls: list[str]
+
 class SummarizeRequest(BaseModel):
     paper_id: str
+    refresh: bool = False  # regenerate instead of replaying a cached result
 
 class ExtractRequest(BaseModel):
     paper_id: str
+    refresh: bool = False
+
+class AnalyzeRequest(BaseModel):
+    paper_id: str
+    refresh: bool = False
 
 class TranslateRequest(BaseModel):
     paper_id: str
     target_lang: str = "zh"  # "zh" or "en"
+    engine: str | None = None  # "google", "llm" or "dictionary"; default from PAPER_READER_TRANSLATE_ENGINE
 
 class ChatRequest(BaseModel):
     paper_id: str
     question: str
-    history: list[dict] = []
+    session_id: str | None = None  # from the {"session"} event of an earlier turn
+    history: list[dict] = []  # only used to seed a new session, e.g. after a 409 for an expired one
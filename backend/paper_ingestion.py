@@ -3,24 +3,49 @@ import re
 import asyncio
 import hashlib
 import logging
-import httpx
+import time
+import tempfile
+from collections import deque
 import fitz  # PyMuPDF
+from urllib.parse import urlsplit, urlunsplit
 from xml.etree import ElementTree
 
+from .paper_store import get_store
+from .http_client import get_client, host_slot
+from . import extraction
+from .extraction import run_in_pool
+from .scheduler import get_scheduler
+from .retrieval import get_index
+
 logger = logging.getLogger(__name__)
 
-# In-memory paper store
-_papers: dict[str, dict] = {}
+
+# The store blocks on SQLite and the filesystem, so these run it in a thread
+
+async def get_paper(paper_id: str) -> dict | None:
+    return await asyncio.to_thread(get_store().get, paper_id)
+
+
+async def get_pdf_path(paper: dict):
+    return await asyncio.to_thread(get_store().get_pdf_path, paper)
 
 
-def get_paper(paper_id: str) -> dict | None:
-    return _papers.get(paper_id)
+async def get_pdf_bytes(paper: dict) -> bytes | None:
+    return await asyncio.to_thread(get_store().get_pdf, paper)
 
 
-def store_paper(paper: dict) -> str:
+async def _get_by_key(key: str) -> dict | None:
+    return await asyncio.to_thread(get_store().get_by_key, key)
+
+
+async def _alias(pid: str, keys: list[str]):
+    await asyncio.to_thread(get_store().alias, pid, keys)
+
+
+async def store_paper(paper: dict, keys: list[str] = ()) -> str:
     pid = hashlib.md5(paper["fullText"][:500].encode()).hexdigest()[:12]
     paper["id"] = pid
-    _papers[pid] = paper
+    await asyncio.to_thread(get_store().put, paper, keys)
     return pid
 
 
@@ -68,6 +93,69 @@ def classify_url(url: str) -> dict:
     return {"type": "invalid"}
 
 
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+def canonical_key(classified: dict) -> str:
+    """Identity of the paper behind a classified URL, so equivalent links share one load."""
+    if classified["type"] == "arxiv":
+        return "arxiv:" + re.sub(r'v\d+$', '', classified["id"])
+    if classified["type"] == "doi":
+        return "doi:" + classified["doi"].lower()
+    return "url:" + _normalize_url(classified.get("url", ""))
+
+
+# ===== Load Deduplication =====
+
+class _Flight:
+    """One in-progress load. Progress events are kept so callers that join late can replay them."""
+
+    def __init__(self, factory):
+        self.events: list[dict] = []
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(factory(self.emit))
+        self.task.add_done_callback(lambda _: self._changed.set())
+
+    def emit(self, event: dict):
+        self.events.append(event)
+        self._changed.set()
+
+    async def follow(self):
+        """Yield every event emitted so far and then new ones, until the load finishes."""
+        seen = 0
+        while True:
+            while seen < len(self.events):
+                yield self.events[seen]
+                seen += 1
+            if self.task.done():
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+
+# Loads currently in progress, by canonical key. Late callers join the same flight.
+_inflight: dict[str, _Flight] = {}
+
+
+def _join_flight(key: str, factory) -> _Flight:
+    """Start `factory(emit)` for `key`, or join the flight already running for it."""
+    flight = _inflight.get(key)
+    if flight is None:
+        flight = _Flight(factory)
+        _inflight[key] = flight
+        flight.task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        logger.info(f"Joining in-flight load: {key}")
+    return flight
+
+
+async def _single_flight(key: str, factory):
+    # Shielded so one client disconnecting doesn't cancel the load for everyone else
+    return await asyncio.shield(_join_flight(key, factory).task)
+
+
 # ===== Claude CLI URL Resolution =====
 
 async def resolve_url_with_claude(url: str) -> dict:
@@ -86,13 +174,15 @@ async def resolve_url_with_claude(url: str) -> dict:
     env = os.environ.copy()
     env.pop("CLAUDECODE", None)
 
-    proc = await asyncio.create_subprocess_exec(
-        "claude", "-p", prompt,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        env=env,
-    )
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
+    # Counts against the global LLM concurrency cap like any other claude process
+    async with get_scheduler().slot("resolve"):
+        proc = await asyncio.create_subprocess_exec(
+            "claude", "-p", prompt,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
     result = stdout.decode().strip()
     logger.info(f"Claude resolved '{url}' -> '{result}'")
 
@@ -114,18 +204,49 @@ async def resolve_url_with_claude(url: str) -> dict:
 
 # ===== ArXiv Metadata =====
 
+ARXIV_NS = {"a": "http://www.w3.org/2005/Atom"}
+# IDs per arXiv API query when fetching metadata in bulk
+ARXIV_BATCH_SIZE = 100
+
+
 async def fetch_arxiv_metadata(arxiv_id: str) -> dict:
     api_url = f"https://export.arxiv.org/api/query?id_list={arxiv_id}"
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(api_url)
+    async with host_slot(api_url):
+        resp = await get_client().get(api_url, timeout=30)
         resp.raise_for_status()
 
-    ns = {"a": "http://www.w3.org/2005/Atom"}
     root = ElementTree.fromstring(resp.text)
-    entry = root.find("a:entry", ns)
+    entry = root.find("a:entry", ARXIV_NS)
     if entry is None:
         return {}
-
+    return _parse_arxiv_entry(entry)
+
+
+async def fetch_arxiv_metadata_batch(arxiv_ids: list[str]) -> dict[str, dict]:
+    """Metadata for many papers in ARXIV_BATCH_SIZE-sized queries, keyed by the IDs as given."""
+    results = {}
+    for i in range(0, len(arxiv_ids), ARXIV_BATCH_SIZE):
+        batch = arxiv_ids[i:i + ARXIV_BATCH_SIZE]
+        api_url = (
+            "https://export.arxiv.org/api/query"
+            f"?id_list={','.join(batch)}&max_results={len(batch)}"
+        )
+        async with host_slot(api_url):
+            resp = await get_client().get(api_url, timeout=60)
+            resp.raise_for_status()
+
+        # Entries come back with versioned abs URLs as IDs; match on the bare ID
+        by_base = {}
+        for entry in ElementTree.fromstring(resp.text).findall("a:entry", ARXIV_NS):
+            entry_id = (entry.findtext("a:id", "", ARXIV_NS) or "").rsplit("/abs/", 1)[-1]
+            by_base[re.sub(r'v\d+$', '', entry_id)] = _parse_arxiv_entry(entry)
+        for arxiv_id in batch:
+            results[arxiv_id] = by_base.get(re.sub(r'v\d+$', '', arxiv_id), {})
+    return results
+
+
+def _parse_arxiv_entry(entry) -> dict:
+    ns = ARXIV_NS
     title = (entry.findtext("a:title", "", ns) or "").strip().replace("\n", " ")
     abstract = (entry.findtext("a:summary", "", ns) or "").strip().replace("\n", " ")
     authors = [a.findtext("a:name", "", ns) for a in entry.findall("a:author", ns)]
@@ -136,32 +257,79 @@ async def fetch_arxiv_metadata(arxiv_id: str) -> dict:
 
 # ===== PDF Download =====
 
-async def download_pdf(url: str) -> bytes:
-    async with httpx.AsyncClient(timeout=60, follow_redirects=True, max_redirects=10) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
-        if len(resp.content) > 50 * 1024 * 1024:
-            raise ValueError("PDF too large (>50MB)")
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+
+async def download_pdf(url: str) -> tuple[str, str]:
+    """Stream the PDF at `url` into a spool file, aborting early on oversize or non-PDF responses.
+
+    Returns (path, sha256 hex digest). The caller owns the file.
+    """
+    async with host_slot(url):
+        async with get_client().stream("GET", url, timeout=60) as resp:
+            resp.raise_for_status()
+            length = resp.headers.get("content-length", "")
+            if length.isdigit() and int(length) > MAX_PDF_BYTES:
+                raise ValueError("PDF too large (>50MB)")
+            content_type = resp.headers.get("content-type", "")
+
+            fd, path = tempfile.mkstemp(suffix=".pdf", dir=get_store().spool_dir())
+            digest = hashlib.sha256()
+            head = b""
+            size = 0
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in resp.aiter_bytes():
+                        # Check if we actually got a PDF (the header may sit anywhere in the first 1 KB)
+                        if size < 1024:
+                            head += chunk[:1024 - size]
+                            if len(head) >= 1024 and b"%PDF-" not in head:
+                                raise ValueError(_not_pdf_message(content_type))
+                        size += len(chunk)
+                        if size > MAX_PDF_BYTES:
+                            raise ValueError("PDF too large (>50MB)")
+                        digest.update(chunk)
+                        f.write(chunk)
+                if b"%PDF-" not in head:
+                    raise ValueError(_not_pdf_message(content_type))
+            except BaseException:
+                os.unlink(path)
+                raise
+
+    return path, digest.hexdigest()
+
+
+def _not_pdf_message(content_type: str) -> str:
+    if "html" in content_type:
+        return (
+            "URL returned HTML, not a PDF. The page might require authentication or the URL isn't a direct PDF link."
+        )
+    return "URL did not return a PDF."
 
-        # Check if we actually got a PDF
-        content_type = resp.headers.get("content-type", "")
-        if "html" in content_type and not resp.content[:5] == b'%PDF-':
-            raise ValueError(
-                f"URL returned HTML, not a PDF. The page might require authentication or the URL isn't a direct PDF link."
-            )
 
-        return resp.content
+# ===== PDF Text Extraction (PyMuPDF) =====
 
+# Documents with at least this many pages are split into page ranges across parse workers
+PARALLEL_MIN_PAGES = int(os.environ.get("PAPER_READER_PARALLEL_PAGES", "64"))
 
-# ===== PDF Text Extraction (PyMuPDF) =====
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> dict:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+def _open_pdf(source: bytes | str):
+    """Open a PDF from raw bytes or from a file path."""
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def extract_text_from_pdf(source: bytes | str) -> dict:
+    doc = _open_pdf(source)
     pages = []
     for page in doc:
         pages.append(page.get_text())
     doc.close()
+    return assemble_pages(pages)
+
 
+def assemble_pages(pages: list[str]) -> dict:
     full_text = "\n\n".join(pages)
     sections = detect_sections(full_text)
 
@@ -173,6 +341,86 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> dict:
     }
 
 
+def extract_page_range(source: bytes | str, start: int, stop: int) -> list[str]:
+    doc = _open_pdf(source)
+    pages = [doc[i].get_text() for i in range(start, stop)]
+    doc.close()
+    return pages
+
+
+def extract_first_pages(source: bytes | str, stop: int) -> tuple[list[str], int]:
+    """The first `stop` pages' text and the document's page count, in one open."""
+    doc = _open_pdf(source)
+    num_pages = doc.page_count
+    pages = [doc[i].get_text() for i in range(min(stop, num_pages))]
+    doc.close()
+    return pages, num_pages
+
+
+def page_spans(num_pages: int, parts: int) -> list[tuple[int, int]]:
+    """Split [0, num_pages) into `parts` contiguous, near-equal ranges."""
+    parts = max(1, min(parts, num_pages))
+    size, extra = divmod(num_pages, parts)
+    spans, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        spans.append((start, stop))
+        start = stop
+    return spans
+
+
+# Page ranges are at most this long, so sections can be reported while later pages still parse
+RANGE_MAX_PAGES = 16
+# The first range is shorter, so the opening sections of any paper show up quickly
+FIRST_RANGE_PAGES = 4
+
+
+async def extract_pdf(source: bytes | str, on_progress=None) -> dict:
+    """Extract text in the parse pool, range by range, reassembled in order.
+
+    `on_progress(sections, pages_done, num_pages)` is called with newly completed sections as pages come in,
+    whatever the document's size. Documents of PARALLEL_MIN_PAGES or more have their ranges parsed in
+    parallel; shorter ones parse one range at a time.
+    """
+    builder = SectionBuilder()
+    pages: list[str] = []
+
+    def feed(new_pages: list[str], num_pages: int):
+        for page in new_pages:
+            builder.feed(page, first=not pages)
+            pages.append(page)
+        if on_progress:
+            on_progress(builder.take_closed(), len(pages), num_pages)
+
+    # The page count comes with the first range rather than costing a round trip of its own
+    head, num_pages = await run_in_pool(extract_first_pages, source, FIRST_RANGE_PAGES)
+    feed(head, num_pages)
+
+    rest = num_pages - len(head)
+    workers = extraction.PARSE_WORKERS
+    parallel = PARALLEL_MIN_PAGES > 0 and workers >= 2 and num_pages >= PARALLEL_MIN_PAGES
+    parts = max(workers if parallel else 1, -(-rest // RANGE_MAX_PAGES))
+    spans = [(len(head) + a, len(head) + b) for a, b in page_spans(rest, parts)] if rest else []
+    if parallel:
+        logger.info(f"Parsing {num_pages} pages in {len(spans) + 1} parallel ranges")
+        jobs = [asyncio.ensure_future(run_in_pool(extract_page_range, source, a, b)) for a, b in spans]
+    try:
+        # Parallel ranges finish in any order but are consumed in document order
+        for i, (a, b) in enumerate(spans):
+            feed(await (jobs[i] if parallel else run_in_pool(extract_page_range, source, a, b)), num_pages)
+    except BaseException:
+        if parallel:
+            for job in jobs:
+                job.cancel()
+        raise
+
+    full_text = "\n\n".join(pages)
+    sections = builder.finish(full_text)
+    if on_progress:
+        on_progress(builder.take_closed(), num_pages, num_pages)
+    return {"pages": pages, "fullText": full_text, "sections": sections, "numPages": num_pages}
+
+
 # ===== Section Detection =====
 
 HEADING_PATTERNS = [
@@ -192,60 +440,163 @@ HEADING_PATTERNS = [
 ]
 
 
-def detect_sections(text: str) -> list[dict]:
-    lines = text.split("\n")
-    sections: list[dict] = []
-    current = {"heading": "Header", "content": ""}
+class SectionBuilder:
+    """Incremental section detection: feed page texts in order, pick up sections as they close."""
 
-    for line in lines:
+    def __init__(self):
+        self.sections: list[dict] = []
+        self._current = {"heading": "Header", "content": ""}
+        self._taken = 0
+
+    def feed(self, text: str, first: bool = True):
+        """Feed one more chunk of text. Chunks after the first are treated as joined by a blank line."""
+        lines = text.split("\n")
+        if not first:
+            self._feed_line("")
+        for line in lines:
+            self._feed_line(line)
+
+    def _feed_line(self, line: str):
+        current = self._current
         trimmed = line.strip()
         if not trimmed:
             current["content"] += "\n"
-            continue
+            return
 
         is_heading = len(trimmed) < 80 and any(p.match(trimmed) for p in HEADING_PATTERNS)
 
         if is_heading:
             if current["content"].strip():
-                sections.append({"heading": current["heading"], "content": current["content"].strip()})
-            current = {"heading": trimmed, "content": ""}
+                self.sections.append({"heading": current["heading"], "content": current["content"].strip()})
+            self._current = {"heading": trimmed, "content": ""}
         else:
             current["content"] += trimmed + " "
 
-    if current["content"].strip():
-        sections.append({"heading": current["heading"], "content": current["content"].strip()})
+    def take_closed(self) -> list[dict]:
+        """Sections completed since the last call."""
+        new = self.sections[self._taken:]
+        self._taken = len(self.sections)
+        return new
+
+    def finish(self, text: str) -> list[dict]:
+        current = self._current
+        if current["content"].strip():
+            self.sections.append({"heading": current["heading"], "content": current["content"].strip()})
+
+        if not self.sections:
+            self.sections.append({"heading": "Full Text", "content": text.strip()})
+
+        return self.sections
 
-    if not sections:
-        sections.append({"heading": "Full Text", "content": text.strip()})
 
-    return sections
+def detect_sections(text: str) -> list[dict]:
+    builder = SectionBuilder()
+    builder.feed(text)
+    return builder.finish(text)
 
 
 # ===== Main Load Flow =====
 
-async def load_paper(url: str) -> dict:
+async def _prepare_load(url: str) -> tuple[dict | None, dict, str, list[str]]:
+    """Classify (and if needed resolve) `url`. Returns (stored paper or None, classified, key, extra keys)."""
     classified = classify_url(url)
+    keys = []
 
     # For unknown URLs, use Claude CLI to resolve
     if classified["type"] in ("unknown", "invalid"):
+        url_key = "url:" + _normalize_url(url)
+        paper = await _get_by_key(url_key)
+        if paper:
+            return paper, classified, url_key, []
         logger.info(f"Unknown URL format, asking Claude to resolve: {url}")
-        classified = await resolve_url_with_claude(url)
+        classified = await _single_flight("resolve:" + url_key, lambda emit: resolve_url_with_claude(url))
         if classified["type"] == "invalid":
             raise ValueError(
                 "Could not identify paper from this URL. "
                 "Try an arXiv URL (e.g. arxiv.org/abs/2301.00234), DOI, or direct PDF link."
             )
+        keys.append(url_key)
+
+    key = canonical_key(classified)
+    paper = await _get_by_key(key)
+    if paper:
+        logger.info(f"Paper already loaded: {key}")
+    return paper, classified, key, keys
+
+
+async def load_paper(url: str, metadata: dict | None = None) -> dict:
+    """Load (or return the stored) paper behind `url`. `metadata` skips the arXiv metadata fetch."""
+    paper, classified, key, keys = await _prepare_load(url)
+    if paper is None:
+        paper = await _single_flight(key, lambda emit: _load_classified(classified, url, key, emit, metadata))
+    if keys:
+        await _alias(paper["id"], keys)
+    return paper
 
-    metadata = {}
 
-    # ArXiv: get metadata + PDF
-    if classified["type"] == "arxiv":
+async def load_paper_events(url: str):
+    """Like load_paper, but yields progress events while loading:
+
+    {"metadata": {...}} once known, {"sections": [...], "pagesDone": n, "numPages": N} as pages are
+    parsed, and finally {"paper": paper}.
+    """
+    paper, classified, key, keys = await _prepare_load(url)
+    if paper is None:
+        flight = _join_flight(key, lambda emit: _load_classified(classified, url, key, emit))
+        async for event in flight.follow():
+            yield event
+        paper = await asyncio.shield(flight.task)
+    if keys:
+        await _alias(paper["id"], keys)
+    yield {"paper": paper}
+
+
+# Per-stage wall-clock seconds of recent loads, for /api/stats
+_load_timings: deque[dict] = deque(maxlen=100)
+
+
+def load_timing_stats() -> dict:
+    stages = {stage for t in _load_timings for stage in t}
+    return {
+        "loads": len(_load_timings),
+        "avgSeconds": {
+            stage: round(sum(t[stage] for t in _load_timings if stage in t)
+                         / sum(1 for t in _load_timings if stage in t), 3)
+            for stage in sorted(stages)
+        },
+    }
+
+
+async def _timed(timings: dict, stage: str, aw):
+    start = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 3)
+
+
+async def _load_classified(classified: dict, url: str, key: str, emit, metadata: dict | None = None) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    metadata_task = None
+
+    # ArXiv: metadata and PDF are fetched concurrently
+    if classified["type"] == "arxiv" and metadata is not None:
+        logger.info(f"Loading arxiv paper: {classified['id']} (metadata prefetched)")
+        if metadata:
+            emit({"metadata": metadata})
+        pdf_url = f"https://arxiv.org/pdf/{classified['id']}.pdf"
+
+    elif classified["type"] == "arxiv":
         arxiv_id = classified["id"]
         logger.info(f"Loading arxiv paper: {arxiv_id}")
-        try:
-            metadata = await fetch_arxiv_metadata(arxiv_id)
-        except Exception as e:
-            logger.warning(f"Failed to fetch arxiv metadata: {e}")
+        metadata_task = asyncio.ensure_future(_timed(timings, "metadata", fetch_arxiv_metadata(arxiv_id)))
+
+        def on_metadata(task):
+            if not task.cancelled() and not task.exception() and task.result():
+                emit({"metadata": task.result()})
+
+        metadata_task.add_done_callback(on_metadata)
         pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
 
     elif classified["type"] == "doi":
@@ -254,28 +605,102 @@ async def load_paper(url: str) -> dict:
     else:
         pdf_url = classified.get("url", url)
 
-    # Download PDF
-    logger.info(f"Downloading PDF from: {pdf_url}")
-    pdf_bytes = await download_pdf(pdf_url)
-
-    # Extract text
-    extracted = extract_text_from_pdf(pdf_bytes)
-
-    # Build paper object
-    paper = {
-        "title": metadata.get("title") or _extract_title(extracted["fullText"]),
-        "authors": metadata.get("authors", []),
-        "abstract": metadata.get("abstract") or _extract_abstract(extracted["fullText"]),
-        "fullText": extracted["fullText"],
-        "sections": extracted["sections"],
-        "numPages": extracted["numPages"],
-        "pdf_bytes": pdf_bytes,
-    }
-
-    pid = store_paper(paper)
+    pdf_path = None
+    try:
+        # Download PDF (spooled to disk, never held in memory)
+        logger.info(f"Downloading PDF from: {pdf_url}")
+        pdf_path, pdf_sha256 = await _timed(timings, "download", download_pdf(pdf_url))
+
+        # Extract text (in the parse pool, off the event loop), reporting sections as they are found.
+        # Workers open the spooled file themselves, so the PDF is never pickled across processes.
+        def on_progress(sections, pages_done, num_pages):
+            emit({"sections": sections, "pagesDone": pages_done, "numPages": num_pages})
+
+        extracted = await _timed(timings, "parse", extract_pdf(pdf_path, on_progress))
+
+        # Metadata failure is tolerated: fall back to what the PDF text gives us
+        metadata = metadata or {}
+        if metadata_task:
+            try:
+                metadata = await metadata_task
+            except Exception as e:
+                logger.warning(f"Failed to fetch arxiv metadata: {e}")
+
+        # Build paper object
+        paper = {
+            "title": metadata.get("title") or _extract_title(extracted["fullText"]),
+            "authors": metadata.get("authors", []),
+            "abstract": metadata.get("abstract") or _extract_abstract(extracted["fullText"]),
+            "fullText": extracted["fullText"],
+            "sections": extracted["sections"],
+            "numPages": extracted["numPages"],
+            "pdf_file": pdf_path,
+            "pdf_sha256": pdf_sha256,
+        }
+
+        await store_paper(paper, [key])
+        # Chat retrieval index, built while the sections are at hand (in a thread: it is CPU-bound)
+        await asyncio.to_thread(get_index, paper)
+    finally:
+        # A failed download, parse or store leaves the metadata request running: stop it
+        if metadata_task:
+            metadata_task.cancel()
+        # Still there only if the load failed before the store took ownership
+        if pdf_path and os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+    _load_timings.append(timings)
+    logger.info(f"Loaded {key} ({paper['numPages']} pages): {timings}")
     return paper
 
 
+# ===== Batch Load =====
+
+BATCH_CONCURRENCY = int(os.environ.get("PAPER_READER_BATCH_CONCURRENCY", "4"))
+
+
+async def load_papers(urls: list[str]):
+    """Load many papers: arXiv metadata in bulk, then downloads + parses with bounded concurrency.
+
+    Yields one result per URL as soon as it is ready (so in completion order, not input order):
+    {"index", "url", "paper"} or {"index", "url", "error"}, where `index` is the URL's position in `urls`.
+    """
+    arxiv_ids = {}
+    for url in urls:
+        classified = classify_url(url)
+        if classified["type"] == "arxiv" and not await _get_by_key(canonical_key(classified)):
+            arxiv_ids[url] = classified["id"]
+
+    metadata = {}
+    if arxiv_ids:
+        try:
+            metadata = await fetch_arxiv_metadata_batch(sorted(set(arxiv_ids.values())))
+        except Exception as e:
+            # Each paper then fetches its own metadata
+            logger.warning(f"Failed to fetch batch arxiv metadata: {e}")
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def load_one(index: int, url: str) -> dict:
+        async with slots:
+            try:
+                paper = await load_paper(url, metadata.get(arxiv_ids.get(url)))
+                return {"index": index, "url": url, "paper": paper}
+            except Exception as e:
+                logger.warning(f"Batch load failed for {url}: {e}")
+                return {"index": index, "url": url, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(load_one(i, url)) for i, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The caller stopped listening (e.g. the client disconnected): don't load the rest
+        for task in tasks:
+            task.cancel()
+
+
 def _extract_title(text: str) -> str:
     for line in text.split("\n")[:10]:
         line = line.strip()
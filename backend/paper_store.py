@@ -0,0 +1,358 @@
+"""Paper store: a byte-capped in-memory LRU in front of SQLite metadata + content-addressed PDF blobs.
+
+The disk tier is size-capped too: past PAPER_READER_DISK_MB, the least recently used papers and their
+PDFs are deleted. Every method may block on SQLite or the filesystem: call them off the event loop.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(os.environ.get("PAPER_READER_DATA_DIR", Path(__file__).parent.parent / "data"))
+MEMORY_LIMIT = int(os.environ.get("PAPER_READER_MEMORY_MB", "256")) * 1024 * 1024
+# Papers (JSON) plus their PDFs on disk; 0 disables the cap
+DISK_LIMIT = int(os.environ.get("PAPER_READER_DISK_MB", "4096")) * 1024 * 1024
+# "disk" keeps papers across restarts, "memory" is the old process-local behaviour
+STORE_BACKEND = os.environ.get("PAPER_READER_STORE", "disk")
+
+
+# ===== PDF Blobs =====
+
+class BlobStore:
+    """PDFs on disk, named by the SHA-256 of their bytes so each one is written once."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.pdf"
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return digest
+
+    def put_file(self, src: str, digest: str):
+        """Move an already-hashed file (on the same filesystem) into the store."""
+        path = self.path_for(digest)
+        if path.exists():
+            os.unlink(src)
+        else:
+            path.parent.mkdir(exist_ok=True)
+            os.replace(src, path)
+
+    def get(self, digest: str) -> bytes | None:
+        try:
+            return self.path_for(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def size(self, digest: str) -> int:
+        try:
+            return self.path_for(digest).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def delete(self, digest: str):
+        try:
+            self.path_for(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ===== Tiers =====
+
+class MemoryTier:
+    """LRU of paper dicts, evicting least recently used entries once `limit` bytes are exceeded."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self.evictions = 0
+        self._items: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+
+    def get(self, pid: str) -> dict | None:
+        item = self._items.get(pid)
+        if item is None:
+            return None
+        self._items.move_to_end(pid)
+        return item[0]
+
+    def put(self, pid: str, paper: dict, size: int):
+        old = self._items.pop(pid, None)
+        if old:
+            self.size -= old[1]
+        self._items[pid] = (paper, size)
+        self.size += size
+        # Always keep the newest entry, even if it alone is over the limit
+        while self.size > self.limit and len(self._items) > 1:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def pop(self, pid: str):
+        old = self._items.pop(pid, None)
+        if old:
+            self.size -= old[1]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class DiskTier:
+    """Paper dicts serialized as JSON rows in SQLite, with `accessed` times for LRU eviction."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, pdf_sha256 TEXT, size INTEGER NOT NULL, "
+            "pdf_size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS papers_accessed ON papers (accessed)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS aliases (key TEXT PRIMARY KEY, paper_id TEXT NOT NULL)")
+        self._db.commit()
+        self.size = self._db.execute("SELECT COALESCE(SUM(size + pdf_size), 0) FROM papers").fetchone()[0]
+        self.evictions = 0
+        # Access times, written with the next put rather than a commit per read
+        self._touched: dict[str, float] = {}
+
+    def touch(self, pid: str):
+        self._touched[pid] = time.time()
+
+    def get(self, pid: str) -> str | None:
+        row = self._db.execute("SELECT data FROM papers WHERE id = ?", (pid,)).fetchone()
+        if row is None:
+            return None
+        self.touch(pid)
+        return row[0]
+
+    def put(self, pid: str, data: str, pdf_sha256: str | None, pdf_size: int):
+        now = time.time()
+        self._touched.pop(pid, None)
+        self._db.executemany("UPDATE papers SET accessed = ? WHERE id = ?", [(t, p) for p, t in self._touched.items()])
+        self._touched.clear()
+        old = self._db.execute("SELECT size + pdf_size FROM papers WHERE id = ?", (pid,)).fetchone()
+        self._db.execute(
+            "INSERT INTO papers (id, data, pdf_sha256, size, pdf_size, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, pdf_sha256 = excluded.pdf_sha256, "
+            "size = excluded.size, pdf_size = excluded.pdf_size, accessed = excluded.accessed",
+            (pid, data, pdf_sha256, len(data), pdf_size, now, now),
+        )
+        self._db.commit()
+        self.size += len(data) + pdf_size - (old[0] if old else 0)
+
+    def evict(self, limit: int, keep: str) -> tuple[list[str], list[str]]:
+        """Delete least recently used papers (never `keep`) until under `limit` bytes.
+
+        Returns (evicted paper ids, PDF digests no paper references any more).
+        """
+        if self.size <= limit:
+            return [], []
+        evicted, digests = [], set()
+        # Down to 95% of the limit, so eviction isn't paid on every put
+        target = limit * 0.95
+        rows = self._db.execute(
+            "SELECT id, pdf_sha256, size + pdf_size FROM papers WHERE id != ? ORDER BY accessed", (keep,)
+        )
+        for pid, digest, size in rows.fetchall():
+            if self.size <= target:
+                break
+            evicted.append(pid)
+            if digest:
+                digests.add(digest)
+            self.size -= size
+        self._db.executemany("DELETE FROM papers WHERE id = ?", [(pid,) for pid in evicted])
+        self._db.executemany("DELETE FROM aliases WHERE paper_id = ?", [(pid,) for pid in evicted])
+        orphans = [
+            d for d in digests
+            if not self._db.execute("SELECT 1 FROM papers WHERE pdf_sha256 = ? LIMIT 1", (d,)).fetchone()
+        ]
+        self._db.commit()
+        for pid in evicted:
+            self._touched.pop(pid, None)
+        self.evictions += len(evicted)
+        return evicted, orphans
+
+    def put_aliases(self, pid: str, keys: list[str]):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO aliases (key, paper_id) VALUES (?, ?)", [(k, pid) for k in keys]
+        )
+        self._db.commit()
+
+    def resolve(self, key: str) -> str | None:
+        row = self._db.execute("SELECT paper_id FROM aliases WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+
+# ===== Store =====
+
+class PaperStore:
+    def __init__(self, memory: MemoryTier, disk: DiskTier | None, blobs: BlobStore | None,
+                 disk_limit: int = DISK_LIMIT):
+        self.memory = memory
+        self.disk = disk
+        self.blobs = blobs
+        self.disk_limit = disk_limit
+        self._lock = threading.Lock()
+        self._aliases: dict[str, str] = {}  # source key (e.g. "arxiv:2301.00234") -> paper id
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def get(self, pid: str) -> dict | None:
+        with self._lock:
+            paper = self.memory.get(pid)
+            if paper is not None:
+                self.hits["memory"] += 1
+                if self.disk:
+                    self.disk.touch(pid)  # still in use, so not a disk eviction candidate
+                return paper
+            data = self.disk.get(pid) if self.disk else None
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits["disk"] += 1
+            paper = json.loads(data)
+            self.memory.put(pid, paper, len(data))
+            return paper
+
+    def get_by_key(self, key: str) -> dict | None:
+        """Look up a paper by one of the source keys it was stored with."""
+        pid = self._aliases.get(key)
+        if pid is None and self.disk:
+            with self._lock:
+                pid = self.disk.resolve(key)
+            if pid:
+                self._aliases[key] = pid
+        return self.get(pid) if pid else None
+
+    def alias(self, pid: str, keys: list[str]):
+        with self._lock:
+            if self.disk:
+                self.disk.put_aliases(pid, list(keys))
+            for key in keys:
+                self._aliases[key] = pid
+
+    def spool_dir(self) -> str:
+        """Where to stage downloads so they can be moved into the blob store without copying."""
+        if not self.blobs:
+            return tempfile.gettempdir()
+        path = self.blobs.root / "tmp"
+        path.mkdir(exist_ok=True)
+        return str(path)
+
+    def put(self, paper: dict, keys: list[str] = ()):
+        """Store `paper` under paper["id"] and `keys`.
+
+        The PDF comes either as `pdf_bytes` or as a spooled `pdf_file` with its `pdf_sha256`; it moves
+        to the blob store, leaving only `pdf_sha256` on the paper.
+        """
+        pdf_bytes = paper.pop("pdf_bytes", None)
+        pdf_file = paper.pop("pdf_file", None)
+        if pdf_file is not None:
+            if self.blobs:
+                self.blobs.put_file(pdf_file, paper["pdf_sha256"])
+            else:
+                with open(pdf_file, "rb") as f:
+                    pdf_bytes = f.read()
+                os.unlink(pdf_file)
+        elif pdf_bytes is not None:
+            paper["pdf_sha256"] = self.blobs.put(pdf_bytes) if self.blobs else hashlib.sha256(pdf_bytes).hexdigest()
+
+        data = json.dumps(paper, ensure_ascii=False)
+        size = len(data)
+        if pdf_bytes is not None and not self.blobs:
+            # Without a blob store the PDF lives (and gets evicted) with its paper
+            paper["pdf_bytes"] = pdf_bytes
+            size += len(pdf_bytes)
+        pdf_size = self.blobs.size(paper["pdf_sha256"]) if self.blobs and paper.get("pdf_sha256") else 0
+        with self._lock:
+            if self.disk:
+                self.disk.put(paper["id"], data, paper.get("pdf_sha256"), pdf_size)
+            self.memory.put(paper["id"], paper, size)
+        self.alias(paper["id"], keys)
+        if self.disk and self.disk_limit:
+            self._evict(keep=paper["id"])
+
+    def _evict(self, keep: str):
+        with self._lock:
+            evicted, orphans = self.disk.evict(self.disk_limit, keep)
+            if not evicted:
+                return
+            for pid in evicted:
+                self.memory.pop(pid)
+            gone = set(evicted)
+            self._aliases = {k: pid for k, pid in self._aliases.items() if pid not in gone}
+        for digest in orphans:
+            self.blobs.delete(digest)
+        logger.info(f"Paper store over {self.disk_limit // (1024 * 1024)} MB on disk: evicted {len(evicted)} papers")
+
+    def get_pdf_path(self, paper: dict) -> Path | None:
+        digest = paper.get("pdf_sha256")
+        if not digest or not self.blobs:
+            return None
+        path = self.blobs.path_for(digest)
+        return path if path.exists() else None
+
+    def get_pdf(self, paper: dict) -> bytes | None:
+        digest = paper.get("pdf_sha256")
+        if not digest:
+            return None
+        if self.blobs:
+            return self.blobs.get(digest)
+        return paper.get("pdf_bytes")
+
+    def stats(self) -> dict:
+        lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+        return {
+            "backend": "disk" if self.disk else "memory",
+            "memoryPapers": len(self.memory),
+            "memoryBytes": self.memory.size,
+            "memoryLimit": self.memory.limit,
+            "evictions": self.memory.evictions,
+            "diskPapers": self.disk.count() if self.disk else None,
+            "diskBytes": self.disk.size if self.disk else None,
+            "diskLimit": self.disk_limit if self.disk else None,
+            "diskEvictions": self.disk.evictions if self.disk else None,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hitRate": round((self.hits["memory"] + self.hits["disk"]) / lookups, 4) if lookups else None,
+        }
+
+
+_store: PaperStore | None = None
+
+
+def get_store() -> PaperStore:
+    global _store
+    if _store is None:
+        if STORE_BACKEND == "memory":
+            _store = PaperStore(MemoryTier(MEMORY_LIMIT), None, None)
+        else:
+            _store = PaperStore(
+                MemoryTier(MEMORY_LIMIT),
+                DiskTier(DATA_DIR / "papers.db"),
+                BlobStore(DATA_DIR / "pdfs"),
+            )
+        logger.info(f"Paper store: {STORE_BACKEND} (memory limit {MEMORY_LIMIT // (1024 * 1024)} MB)")
+    return _store
@@ -13,6 +13,34 @@ Use bullet points. Be concise."""
 
 EXTRACT_USER = "Extract key points:\n\n{text}"
 
+ANALYZE_SYSTEM = """You are an expert academic paper reader. Write two markdown documents in one reply,
+each introduced by its marker on a line of its own:
+
+<<<SUMMARY>>>
+A concise structured summary. Include: 1) Main Objective 2) Methodology 3) Key Findings 4) Significance.
+Use bullet points. Be brief.
+
+<<<KEYPOINTS>>>
+Key points in sections:
+## Main Contributions
+## Methodology
+## Key Results
+## Limitations
+Use bullet points. Be concise.
+
+Write the markers exactly as shown and nothing outside the two documents."""
+
+ANALYZE_USER = "Summarize this paper, then extract its key points:\n\n{text}"
+
+# Marker -> SSE channel for the combined analysis
+ANALYZE_CHANNELS = {"<<<SUMMARY>>>": "summary", "<<<KEYPOINTS>>>": "keypoints"}
+
+MAP_SYSTEM = """You are reading one part of a longer academic paper. Write compact notes on this part only:
+objectives, methods, results (keep the numbers), and any limitations it mentions.
+Use bullet points. Do not guess about the rest of the paper."""
+
+MAP_USER = "Take notes on this part of the paper:\n\n{text}"
+
 TRANSLATE_SYSTEM = """You are an academic translator. Translate to {target_lang}.
 Rules:
 - Translate section by section, keeping ## headings
@@ -23,9 +51,33 @@ Rules:
 
 TRANSLATE_USER = "Translate each section to {target_lang}. Start immediately:\n\n{text}"
 
+TRANSLATE_LINES_SYSTEM = """You translate section headings of an academic paper to {target_lang}.
+Rules:
+- Each input line is one heading; output exactly one translated line per input line, in the same order
+- Keep section numbers and technical terms as they are
+- Output only the translations: no markdown, no # marks, no numbering you were not given, no commentary"""
+
+TRANSLATE_LINES_USER = "Translate these {count} lines to {target_lang}:\n\n{text}"
+
 CHAT_SYSTEM = """Answer questions about this paper concisely. Use markdown. Cite specific parts when relevant.
+Each question comes with the passages of the paper most relevant to it, each marked with its section;
+name the section when you rely on a passage.
 
 Paper:
-{context}"""
+{paper}"""
+
+CHAT_SUMMARY = "Summary of the conversation so far:\n{summary}"
+
+CHAT_TURN = """Passages relevant to this question:
+
+{context}User: {question}
+
+Assistant:"""
+
+COMPACT_SYSTEM = """Condense this conversation about an academic paper into a short summary the assistant can rely on later.
+Keep what was asked, the key facts and numbers in the answers, and anything the user said about their goals.
+Use bullet points."""
+
+COMPACT_USER = "Summary so far:\n{summary}\n\nTurns to fold in:\n\n{transcript}"
 
 LANG_MAP = {"zh": "Chinese (简体中文)", "en": "English"}
@@ -0,0 +1,131 @@
+"""Per-paper BM25 index over section passages, so chat sends only the parts relevant to a question."""
+
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+RETRIEVAL_TOP_K = int(os.environ.get("PAPER_READER_RETRIEVAL_K", "8"))
+PASSAGE_CHARS = 1200
+INDEX_CACHE_SIZE = 64
+
+# BM25 parameters (the usual defaults)
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it its of on or that the this to was what "
+    "when where which who why with we our they their these those there into than then also such not".split()
+)
+
+# Latin words / numbers, or single CJK characters (indexed as bigrams below)
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[぀-ヿ㐀-䶿一-鿿가-힯]")
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    prev_cjk = None
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(tok):
+            # CJK has no spaces: character bigrams work far better than single characters
+            tokens.append(prev_cjk + tok if prev_cjk else tok)
+            prev_cjk = tok
+        else:
+            prev_cjk = None
+            if tok not in STOPWORDS and (len(tok) > 1 or tok.isdigit()):
+                tokens.append(tok)
+    return tokens
+
+
+def build_passages(sections: list[dict], max_chars: int = PASSAGE_CHARS) -> list[dict]:
+    """Split sections into paragraph-aligned passages of at most ~max_chars, in paper order."""
+    passages = []
+    for s in sections:
+        current = ""
+        for para in re.split(r"\n\s*\n", s["content"]):
+            para = para.strip()
+            if not para:
+                continue
+            if current and len(current) + len(para) > max_chars:
+                passages.append({"section": s["heading"], "text": current})
+                current = ""
+            # A single huge paragraph is cut at the limit rather than kept whole
+            while len(para) > max_chars:
+                passages.append({"section": s["heading"], "text": para[:max_chars]})
+                para = para[max_chars:]
+            current = f"{current}\n\n{para}" if current else para
+        if current:
+            passages.append({"section": s["heading"], "text": current})
+    return passages
+
+
+class BM25Index:
+    def __init__(self, passages: list[dict]):
+        self.passages = passages
+        # Section headings are part of what a passage is about
+        self._tfs = [Counter(tokenize(f"{p['section']} {p['text']}")) for p in passages]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        df = Counter(term for tf in self._tfs for term in tf)
+        n = len(passages)
+        self._idf = {term: math.log(1 + (n - f + 0.5) / (f + 0.5)) for term, f in df.items()}
+
+    def scores(self, query: str) -> list[float]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        scores = []
+        for tf, length in zip(self._tfs, self._lengths):
+            norm = K1 * (1 - B + B * length / self._avg_length) if self._avg_length else K1
+            scores.append(sum(self._idf[t] * tf[t] * (K1 + 1) / (tf[t] + norm) for t in terms if t in tf))
+        return scores
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> list[dict]:
+        """The k best passages for `query`, in paper order.
+
+        Questions with no matching terms ("summarize this") get the opening passages, and a short
+        result list is topped up with them.
+        """
+        scores = self.scores(query)
+        ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: -scores[i])[:k]
+        for i in range(len(self.passages)):
+            if len(ranked) >= k:
+                break
+            if i not in ranked:
+                ranked.append(i)
+        return [self.passages[i] for i in sorted(ranked)]
+
+
+_indexes: OrderedDict[str, BM25Index] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(paper: dict) -> BM25Index:
+    """The paper's index, built on first use (normally at ingestion) and kept in a small LRU.
+
+    Building takes ~150 ms for a long paper: call this (and retrieve_context) off the event loop.
+    """
+    with _indexes_lock:
+        index = _indexes.get(paper["id"])
+        if index is not None:
+            _indexes.move_to_end(paper["id"])
+            return index
+    index = BM25Index(build_passages(paper.get("sections", [])))
+    with _indexes_lock:
+        _indexes[paper["id"]] = index
+        if len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def paper_header(paper: dict) -> str:
+    """Title and abstract: the part of the paper every chat turn gets."""
+    text = f"Title: {paper.get('title', '')}"
+    if paper.get("abstract"):
+        text += f"\n\nAbstract: {paper['abstract']}"
+    return text
+
+
+def retrieve_context(paper: dict, question: str, k: int = RETRIEVAL_TOP_K) -> str:
+    """The k passages most relevant to `question`, labelled with their sections."""
+    return "".join(f"[Section: {p['section']}]\n{p['text']}\n\n" for p in get_index(paper).search(question, k))
@@ -0,0 +1,172 @@
+"""Global LLM scheduler: caps concurrent generations, serves interactive work first, round-robins clients."""
+
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+LLM_CONCURRENCY = int(os.environ.get("PAPER_READER_LLM_CONCURRENCY", "4"))
+
+# Priority classes, lower is served first
+INTERACTIVE = 0  # Q&A chat, URL resolution
+BACKGROUND = 1  # auto-summarize / key points
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class Ticket:
+    """A place in the scheduler queue. `position` is how many waiters are ahead (0 once granted)."""
+
+    def __init__(self, scheduler: "LLMScheduler", client: str, priority: int):
+        self.scheduler = scheduler
+        self.client = client
+        self.priority = priority
+        self.position = 0
+        self.granted = False
+        self.released = False
+        self.enqueued = time.monotonic()
+        self._changed = asyncio.Event()
+
+    def _update(self, position: int):
+        if position != self.position:
+            self.position = position
+            self._changed.set()
+
+    def _grant(self):
+        self.granted = True
+        self.position = 0
+        self.scheduler._record_wait(self)
+        self._changed.set()
+
+    async def positions(self):
+        """Yield the queue position whenever it changes, returning once the slot is granted."""
+        last = None
+        while not self.granted:
+            if self.position != last:
+                last = self.position
+                yield last
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def wait(self):
+        async for _ in self.positions():
+            pass
+
+    def release(self):
+        """Give the slot back, or leave the queue if it was never granted. Safe to call twice."""
+        if self.released:
+            return
+        self.released = True
+        self.scheduler._release(self)
+
+
+class LLMScheduler:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self._running_by_client: dict[str, int] = {}
+        self._last_grant: dict[str, int] = {}  # client -> grant sequence number, for round-robin
+        self._grants = 0
+        # priority -> client -> that client's waiting tickets
+        self._queues: dict[int, OrderedDict[str, deque[Ticket]]] = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._waits: dict[int, deque[float]] = {p: deque(maxlen=500) for p in PRIORITY_NAMES}
+        self._served = {p: 0 for p in PRIORITY_NAMES}
+
+    def ticket(self, client: str, priority: int = INTERACTIVE) -> Ticket:
+        """Join the queue. The ticket is granted immediately when a slot is free and nobody is waiting."""
+        ticket = Ticket(self, client, priority)
+        self._queues[priority].setdefault(client, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: int = INTERACTIVE):
+        ticket = self.ticket(client, priority)
+        try:
+            await ticket.wait()
+            yield
+        finally:
+            ticket.release()
+
+    def _order(self) -> list[Ticket]:
+        """Waiting tickets in the order they will be granted."""
+        order = []
+        for priority in sorted(self._queues):
+            clients = [list(self._queues[priority][c]) for c in self._client_order(priority)]
+            for rnd in range(max((len(q) for q in clients), default=0)):
+                order.extend(q[rnd] for q in clients if rnd < len(q))
+        return order
+
+    def _dispatch(self):
+        while self.running < self.limit:
+            ticket = self._pop_next()
+            if ticket is None:
+                break
+            self.running += 1
+            self._running_by_client[ticket.client] = self._running_by_client.get(ticket.client, 0) + 1
+            self._last_grant[ticket.client] = self._grants
+            self._grants += 1
+            ticket._grant()
+        for position, ticket in enumerate(self._order(), start=1):
+            ticket._update(position)
+
+    def _client_order(self, priority: int) -> list[str]:
+        """Clients with the fewest generations running go first, then the one served least recently."""
+        return sorted(
+            self._queues[priority],
+            key=lambda c: (self._running_by_client.get(c, 0), self._last_grant.get(c, -1)),
+        )
+
+    def _pop_next(self) -> Ticket | None:
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            if queue:
+                client = self._client_order(priority)[0]
+                tickets = queue[client]
+                ticket = tickets.popleft()
+                if not tickets:
+                    del queue[client]
+                return ticket
+        return None
+
+    def _release(self, ticket: Ticket):
+        if ticket.granted:
+            self.running -= 1
+            self._running_by_client[ticket.client] -= 1
+            if not self._running_by_client[ticket.client]:
+                del self._running_by_client[ticket.client]
+                if not any(ticket.client in q for q in self._queues.values()):
+                    self._last_grant.pop(ticket.client, None)
+        else:
+            tickets = self._queues[ticket.priority].get(ticket.client)
+            if tickets and ticket in tickets:
+                tickets.remove(ticket)
+                if not tickets:
+                    del self._queues[ticket.priority][ticket.client]
+        self._dispatch()
+
+    def _record_wait(self, ticket: Ticket):
+        self._waits[ticket.priority].append(time.monotonic() - ticket.enqueued)
+        self._served[ticket.priority] += 1
+
+    def stats(self) -> dict:
+        classes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self._waits[priority])
+            classes[name] = {
+                "queued": sum(len(q) for q in self._queues[priority].values()),
+                "served": self._served[priority],
+                "avgWaitSeconds": round(sum(waits) / len(waits), 3) if waits else None,
+                "p95WaitSeconds": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None,
+            }
+        return {"limit": self.limit, "running": self.running, "classes": classes}
+
+
+_scheduler: LLMScheduler | None = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(LLM_CONCURRENCY)
+    return _scheduler
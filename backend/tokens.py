@@ -0,0 +1,130 @@
+"""Token budgeting: a fast per-script token estimate, used to pack prompts without overflowing them."""
+
+import hashlib
+import math
+import re
+from collections import OrderedDict
+
+# Estimated tokens per unit, per script. Tuned so typical English prose comes out near 4 characters per
+# token, and erring high for CJK, symbols and digits, which BPE vocabularies split finely.
+RATES = {
+    "latin_char": 0.22,  # per letter of a Latin word...
+    "latin_word": 0.35,  # ...plus per word, so short common words come out near one token
+    "digit": 0.4,  # numbers split into groups of 1-3 digits
+    "cjk": 1.2,  # Han / kana / Hangul characters, often one token or more each
+    "other_letter": 0.5,  # Greek, Cyrillic, accented letters
+    "ascii_symbol": 0.7,  # punctuation, LaTeX, code operators
+    "other_symbol": 1.5,  # math symbols and other non-ASCII punctuation: several bytes each
+    "break": 0.5,  # newlines and indentation runs
+}
+
+_LATIN_RE = re.compile(r"[A-Za-z]+")
+_DIGIT_RE = re.compile(r"[0-9]+")
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+")
+_ASCII_SYMBOL_RE = re.compile(r"[!-/:-@\[-`{-~]+")
+_BREAK_RE = re.compile(r"\n|[ \t]{2,}")
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+_NON_ASCII_LETTER_RE = re.compile(r"[^\W\d_\x00-\x7f]+")
+
+# Correction applied on top of RATES for prompt budgets (estimate_tokens(calibrated=True)), learned from
+# token counts the API reports (see calibrate)
+_scale = 1.0
+
+
+def _runs(pattern: re.Pattern, text: str) -> tuple[int, int]:
+    """(number of runs, total characters) matched by `pattern`."""
+    runs = pattern.findall(text)
+    return len(runs), sum(map(len, runs))
+
+
+def _measure(text: str) -> float:
+    words, letters = _runs(_LATIN_RE, text)
+    _, digits = _runs(_DIGIT_RE, text)
+    _, cjk = _runs(_CJK_RE, text)
+    _, ascii_symbols = _runs(_ASCII_SYMBOL_RE, text)
+    breaks, _ = _runs(_BREAK_RE, text)
+    _, non_ascii = _runs(_NON_ASCII_RE, text)
+    _, non_ascii_letters = _runs(_NON_ASCII_LETTER_RE, text)
+    # Non-ASCII that is neither CJK nor a letter (math, arrows, dashes) counts as a symbol
+    other_letters = non_ascii_letters - cjk
+    other_symbols = non_ascii - non_ascii_letters
+    return (
+        letters * RATES["latin_char"]
+        + words * RATES["latin_word"]
+        + digits * RATES["digit"]
+        + cjk * RATES["cjk"]
+        + other_letters * RATES["other_letter"]
+        + ascii_symbols * RATES["ascii_symbol"]
+        + other_symbols * RATES["other_symbol"]
+        + breaks * RATES["break"]
+    )
+
+
+ESTIMATE_CACHE_SIZE = 8192
+# Texts up to this long (about a paragraph) are cached under themselves; longer ones (sections, whole
+# papers) under a digest, so the cache never keeps a paper's text alive
+ESTIMATE_KEY_MAX_CHARS = 2000
+
+_estimates: OrderedDict[str | bytes, float] = OrderedDict()
+
+
+def _raw_estimate(text: str) -> float:
+    key = text if len(text) <= ESTIMATE_KEY_MAX_CHARS else hashlib.blake2b(text.encode(), digest_size=16).digest()
+    raw = _estimates.get(key)
+    if raw is None:
+        raw = _estimates[key] = _measure(text)
+        if len(_estimates) > ESTIMATE_CACHE_SIZE:
+            _estimates.popitem(last=False)
+    else:
+        _estimates.move_to_end(key)
+    return raw
+
+
+def estimate_tokens(text: str, calibrated: bool = False) -> int:
+    """Approximate token count of `text`. Cached, so re-measuring the same section is free.
+
+    Uncalibrated by default: chunk boundaries and cache keys depend on it and must not move as
+    calibrate() learns. Pass calibrated=True only to fit text into a prompt budget.
+    """
+    if not text:
+        return 0
+    return math.ceil(_raw_estimate(text) * (_scale if calibrated else 1.0))
+
+
+def calibrate(text: str, actual_tokens: int):
+    """Nudge the estimate toward a token count reported by the model API for `text`."""
+    global _scale
+    raw = _raw_estimate(text)
+    if raw < 500 or actual_tokens <= 0:
+        return  # too short to say anything about the ratio
+    observed = min(max(actual_tokens / raw, 0.5), 2.0)
+    _scale = 0.8 * _scale + 0.2 * observed
+
+
+def truncate_to_tokens(text: str, max_tokens: int, calibrated: bool = False) -> str:
+    """The longest prefix of `text` (cut at a line or word boundary where possible) within `max_tokens`."""
+    if estimate_tokens(text, calibrated) <= max_tokens:
+        return text
+    scale = _scale if calibrated else 1.0
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if math.ceil(_measure(text[:mid]) * scale) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > lo // 2 else cut
+
+
+def fit_messages(messages: list[dict], max_tokens: int) -> list[dict]:
+    """The most recent messages whose contents fit in `max_tokens` (a prompt budget, so calibrated), oldest first."""
+    kept, used = [], 0
+    for msg in reversed(messages):
+        cost = estimate_tokens(msg["content"], calibrated=True) + 4  # role label and separators
+        if used + cost > max_tokens:
+            break
+        kept.append(msg)
+        used += cost
+    return kept[::-1]
@@ -0,0 +1,119 @@
+"""Translation memory: translated segments in SQLite, keyed by (normalized segment hash, source, target, engine)."""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .paper_store import DATA_DIR, STORE_BACKEND
+
+# Least recently used segments are evicted past this many entries
+TM_MAX_ENTRIES = int(os.environ.get("PAPER_READER_TM_MAX_ENTRIES", "200000"))
+
+
+def segment_hash(text: str) -> str:
+    """Hash of the segment with surrounding whitespace and runs of spaces ignored."""
+    normalized = re.sub(r"[ \t]+", " ", text.strip())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class TranslationMemory:
+    def __init__(self, path: Path | str, max_entries: int = TM_MAX_ENTRIES):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A cache: losing the last few writes in a power cut is fine, an fsync per commit is not
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "hash TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, engine TEXT NOT NULL, "
+            "translation TEXT NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (hash, source, target, engine))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS segments_accessed ON segments (accessed)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._count = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Access times of hits, written with the next put (or every TOUCH_BATCH hits) instead of a commit per hit
+        self._touched: dict[tuple, float] = {}
+
+    TOUCH_BATCH = 256
+
+    def get(self, text: str, source: str, target: str, engine: str = "google") -> str | None:
+        """Blocking (SQLite): call it off the event loop."""
+        key = (segment_hash(text), source, target, engine)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT translation FROM segments WHERE hash = ? AND source = ? AND target = ? AND engine = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._write_touched()
+                self._db.commit()
+        return row[0]
+
+    def _write_touched(self):
+        self._db.executemany(
+            "UPDATE segments SET accessed = ? WHERE hash = ? AND source = ? AND target = ? AND engine = ?",
+            [(accessed, *key) for key, accessed in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def put(self, text: str, source: str, target: str, translation: str, engine: str = "google"):
+        """Blocking (SQLite): call it off the event loop."""
+        with self._lock:
+            self._write_touched()
+            key = (segment_hash(text), source, target, engine)
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO segments (hash, source, target, engine, translation, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, translation, time.time()),
+            ).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE segments SET translation = ?, accessed = ? "
+                    "WHERE hash = ? AND source = ? AND target = ? AND engine = ?",
+                    (translation, time.time(), *key),
+                )
+            self._count += inserted
+            if self._count > self.max_entries:
+                # Evict in batches of 1% so eviction isn't paid on every insert
+                excess = self._count - self.max_entries + max(1, self.max_entries // 100)
+                deleted = self._db.execute(
+                    "DELETE FROM segments WHERE rowid IN (SELECT rowid FROM segments ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self._count -= deleted
+                self.evictions += deleted
+            self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_memory: TranslationMemory | None = None
+
+
+def get_translation_memory() -> TranslationMemory:
+    global _memory
+    if _memory is None:
+        _memory = TranslationMemory(":memory:" if STORE_BACKEND == "memory" else DATA_DIR / "translations.db")
+    return _memory
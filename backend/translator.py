@@ -1,54 +1,313 @@
-"""Fast translation via Google Translate — no API key, no cost, instant results."""
+"""Section translation through pluggable engines: Google Translate (default), the LLM, or an offline dictionary."""
 
-from deep_translator import GoogleTranslator
+import asyncio
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-# Google Translate has a 5000 char limit per request, so we chunk long texts
-MAX_CHUNK = 4500
+from .llm import build_prompt, llm_events
+from .scheduler import BACKGROUND
+from .translation_memory import get_translation_memory
+from . import prompts
 
+TRANSLATE_ENGINE = os.environ.get("PAPER_READER_TRANSLATE_ENGINE", "google")
 
-def _translate_text(text: str, target: str, source: str = "auto") -> str:
-    """Translate text, chunking if too long."""
-    if not text.strip():
-        return text
+# deep_translator makes blocking HTTP calls, so they run on these threads instead of the event loop
+TRANSLATE_THREADS = int(os.environ.get("PAPER_READER_TRANSLATE_THREADS", "8"))
+# Translation calls in flight per request; sections and chunks beyond this wait their turn
+TRANSLATE_CONCURRENCY = int(os.environ.get("PAPER_READER_TRANSLATE_CONCURRENCY", "8"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TRANSLATE_THREADS, thread_name_prefix="translate")
+    return _executor
+
+
+def shutdown_translator():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), partial(fn, *args))
+
+
+# ===== Engines =====
+
+class TranslationEngine(ABC):
+    """Translates one piece of text of at most `max_chunk` characters. Subclasses implement translate()."""
+
+    name = "base"
+    max_chunk = 4500
+    cacheable = True  # whether results go into the translation memory
+
+    @abstractmethod
+    async def translate(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        """`client` is who asked, for engines that share a fair queue between users (see scheduler)."""
+
+    async def translate_lines(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        """Translate short lines (headings) one-for-one; by default the same as translate()."""
+        return await self.translate(text, target, source, client)
+
+
+class GoogleEngine(TranslationEngine):
+    """Google Translate via deep_translator: free, no API key."""
+
+    name = "google"
+    max_chunk = 4500  # Google Translate has a 5000 char limit per request
+
+    def _translate(self, text: str, target: str, source: str) -> str:
+        from deep_translator import GoogleTranslator
 
-    if len(text) <= MAX_CHUNK:
         return GoogleTranslator(source=source, target=target).translate(text)
 
-    # Split by paragraphs, translate in chunks
+    async def translate(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        return await _in_thread(self._translate, text, target, source)
+
+
+class LLMEngine(TranslationEngine):
+    """The configured LLM backend with prompts.TRANSLATE_SYSTEM: slower, but keeps terminology and markdown."""
+
+    name = "llm"
+    max_chunk = 8000
+
+    async def _complete(self, prompt: str, client: str) -> str:
+        parts = []
+        async for event in llm_events(prompt, client, BACKGROUND):
+            if "token" in event:
+                parts.append(event["token"])
+        return "".join(parts).strip()
+
+    async def translate(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        lang = prompts.LANG_MAP.get(target.split("-")[0], target)
+        return await self._complete(build_prompt(
+            prompts.TRANSLATE_SYSTEM.format(target_lang=lang),
+            prompts.TRANSLATE_USER.format(target_lang=lang, text=text),
+        ), client)
+
+    async def translate_lines(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        # TRANSLATE_SYSTEM asks for markdown sections, which breaks the one-line-per-heading contract
+        lang = prompts.LANG_MAP.get(target.split("-")[0], target)
+        return await self._complete(build_prompt(
+            prompts.TRANSLATE_LINES_SYSTEM.format(target_lang=lang),
+            prompts.TRANSLATE_LINES_USER.format(target_lang=lang, count=text.count("\n") + 1, text=text),
+        ), client)
+
+
+# Built-in English -> Chinese glossary of common paper headings and terms
+GLOSSARY_ZH = {
+    "abstract": "摘要", "introduction": "引言", "background": "背景", "related work": "相关工作",
+    "preliminaries": "预备知识", "method": "方法", "methods": "方法", "methodology": "方法论",
+    "approach": "方法", "model": "模型", "experiments": "实验", "experiment": "实验",
+    "experimental setup": "实验设置", "evaluation": "评估", "results": "结果", "analysis": "分析",
+    "discussion": "讨论", "limitations": "局限性", "conclusion": "结论", "conclusions": "结论",
+    "future work": "未来工作", "acknowledgements": "致谢", "acknowledgments": "致谢",
+    "references": "参考文献", "appendix": "附录", "dataset": "数据集", "datasets": "数据集",
+    "ablation study": "消融实验", "training": "训练", "inference": "推理", "baseline": "基线",
+    "baselines": "基线", "accuracy": "准确率", "performance": "性能", "attention": "注意力",
+    "neural network": "神经网络", "neural networks": "神经网络", "deep learning": "深度学习",
+    "language model": "语言模型", "language models": "语言模型",
+}
+
+GLOSSARY_PATH = os.environ.get("PAPER_READER_GLOSSARY", "")
+
+
+class DictionaryEngine(TranslationEngine):
+    """Offline and deterministic: swaps glossary terms and leaves the rest of the text as is.
+
+    Meant for tests and air-gapped deployments. PAPER_READER_GLOSSARY may point to a JSON file of
+    {"zh-CN": {"term": "translation", ...}, ...} extending the built-in English -> Chinese glossary.
+    """
+
+    name = "dictionary"
+    max_chunk = 100_000
+    cacheable = False  # cheaper to redo than to look up
+
+    def __init__(self, glossaries: dict[str, dict[str, str]] | None = None):
+        self.glossaries = {"zh-CN": dict(GLOSSARY_ZH)}
+        if glossaries is None and GLOSSARY_PATH:
+            with open(GLOSSARY_PATH, encoding="utf-8") as f:
+                glossaries = json.load(f)
+        for target, terms in (glossaries or {}).items():
+            self.glossaries.setdefault(target, {}).update({k.lower(): v for k, v in terms.items()})
+        # Longest terms first, so "related work" wins over "work"
+        self._patterns = {
+            target: re.compile(
+                r"\b(" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")\b", re.I
+            )
+            for target, terms in self.glossaries.items() if terms
+        }
+
+    async def translate(self, text: str, target: str, source: str = "auto", client: str = "internal") -> str:
+        pattern = self._patterns.get(target)
+        if pattern is None:
+            return text
+        terms = self.glossaries[target]
+        return pattern.sub(lambda m: terms[m.group(0).lower()], text)
+
+
+ENGINES = {"google": GoogleEngine, "llm": LLMEngine, "dictionary": DictionaryEngine}
+
+_engines: dict[str, TranslationEngine] = {}
+
+
+def get_engine(name: str | None = None) -> TranslationEngine:
+    """The named engine, or the one selected by PAPER_READER_TRANSLATE_ENGINE."""
+    name = name or TRANSLATE_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown translation engine: {name} (expected one of {', '.join(ENGINES)})")
+    if name not in _engines:
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
+
+
+# ===== Pipeline =====
+
+def _split_chunks(text: str, max_chunk: int) -> list[str]:
+    """Split text at line breaks into pieces under max_chunk."""
+    if len(text) <= max_chunk:
+        return [text]
+
     paragraphs = text.split("\n")
     chunks = []
     current = ""
 
     for para in paragraphs:
-        if len(current) + len(para) > MAX_CHUNK and current:
+        if len(current) + len(para) > max_chunk and current:
             chunks.append(current)
             current = ""
         current += para + "\n"
 
     if current.strip():
         chunks.append(current)
+    return chunks
+
+
+async def _translate_text(text: str, target: str, limit: asyncio.Semaphore, engine: TranslationEngine,
+                          source: str = "auto", client: str = "internal") -> str:
+    """Translate text, with long texts split into chunks that are translated concurrently.
+
+    Chunks already in the translation memory (for this engine) are not re-sent.
+    """
+    if not text.strip():
+        return text
+
+    memory = get_translation_memory() if engine.cacheable else None
+
+    async def one(chunk: str) -> str:
+        cached = await asyncio.to_thread(memory.get, chunk, source, target, engine.name) if memory else None
+        if cached is not None:
+            return cached
+        async with limit:
+            translated = await engine.translate(chunk, target, source, client)
+        if memory:
+            await asyncio.to_thread(memory.put, chunk, source, target, translated, engine.name)
+        return translated
+
+    return "\n".join(await asyncio.gather(*(one(chunk) for chunk in _split_chunks(text, engine.max_chunk))))
+
+
+def _single_line(reply: str) -> str | None:
+    """A reply to one heading as one line without markdown # marks, or None if it isn't a single line."""
+    lines = [line.strip() for line in reply.split("\n") if line.strip()]
+    if len(lines) != 1:
+        return None
+    return lines[0].lstrip("#").strip() or None
 
-    translator = GoogleTranslator(source=source, target=target)
-    translated_chunks = [translator.translate(chunk) for chunk in chunks]
-    return "\n".join(translated_chunks)
 
+async def translate_headings(headings: list[str], target: str, limit: asyncio.Semaphore | None = None,
+                             source: str = "auto", engine: TranslationEngine | None = None,
+                             client: str = "internal") -> list[str]:
+    """Translate a paper's headings, one per line, in as few requests as the engine's max_chunk allows.
 
-def translate_sections(sections: list[dict], target_lang: str):
-    """Yield (heading, translated_text) for each section. Generator for streaming."""
-    for section in sections:
-        heading = section["heading"]
-        content = section["content"]
+    If a reply doesn't split back into the same number of lines, that batch is retried heading by heading;
+    a heading that still fails, or whose reply isn't a single line, is kept untranslated.
+    """
+    engine = engine or get_engine()
+    limit = limit or asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+    memory = get_translation_memory() if engine.cacheable else None
+    if memory:
+        results = await asyncio.to_thread(
+            lambda: [memory.get(h, source, target, engine.name) if h.strip() else h for h in headings]
+        )
+    else:
+        results = [None if h.strip() else h for h in headings]
+    # Headings are single lines, so line breaks are a safe delimiter
+    pending = [(i, " ".join(h.split())) for i, h in enumerate(headings) if results[i] is None]
 
-        # Translate heading
+    batches, current, size = [], [], 0
+    for item in pending:
+        if current and size + len(item[1]) + 1 > engine.max_chunk:
+            batches.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += len(item[1]) + 1
+    if current:
+        batches.append(current)
+
+    async def one(text: str) -> str:
+        async with limit:
+            return await engine.translate_lines(text, target, source, client)
+
+    async def run_batch(batch: list[tuple[int, str]]):
         try:
-            translated_heading = _translate_text(heading, target_lang)
+            reply = await one("\n".join(h for _, h in batch))
+            lines = [line.strip().lstrip("#").strip() for line in reply.split("\n") if line.strip().lstrip("#").strip()]
         except Exception:
-            translated_heading = heading
+            lines = []
+        if len(lines) != len(batch):
+            replies = await asyncio.gather(*(one(h) for _, h in batch), return_exceptions=True)
+            lines = [None if isinstance(r, Exception) else _single_line(r) for r in replies]
+        translated = [(i, line) for (i, _), line in zip(batch, lines) if line is not None]
+        for i, line in translated:
+            results[i] = line
+        if memory and translated:
+            await asyncio.to_thread(
+                lambda: [memory.put(headings[i], source, target, line, engine.name) for i, line in translated]
+            )
 
-        # Translate content
-        try:
-            translated_content = _translate_text(content, target_lang)
-        except Exception as e:
-            translated_content = f"[Translation failed: {e}]"
+    await asyncio.gather(*(run_batch(batch) for batch in batches))
+    return [r if r is not None else h for r, h in zip(results, headings)]
+
+
+async def _translate_content(content: str, target_lang: str, limit: asyncio.Semaphore,
+                             engine: TranslationEngine, client: str) -> str:
+    try:
+        return await _translate_text(content, target_lang, limit, engine, client=client)
+    except Exception as e:
+        return f"[Translation failed: {e}]"
+
+
+async def translate_sections(sections: list[dict], target_lang: str, concurrency: int = TRANSLATE_CONCURRENCY,
+                             headings: list[str] | None = None, engine: TranslationEngine | None = None,
+                             client: str = "internal"):
+    """Yield (heading, translated_text) for each section, in document order.
 
-        yield translated_heading, translated_content
+    Headings are translated up front in one batch (pass `headings` if that was already done). Section
+    bodies are all started at once, with at most `concurrency` translation calls in flight; a section is
+    yielded as soon as it and every section before it are done.
+    """
+    engine = engine or get_engine()
+    limit = asyncio.Semaphore(concurrency)
+    if headings is None:
+        headings = await translate_headings(
+            [s["heading"] for s in sections], target_lang, limit, engine=engine, client=client
+        )
+    tasks = [
+        asyncio.ensure_future(_translate_content(s["content"], target_lang, limit, engine, client)) for s in sections
+    ]
+    try:
+        for heading, task in zip(headings, tasks):
+            yield heading, await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,91 @@
+"""Benchmark PDF text extraction: the serial page loop vs. page-parallel extraction in the parse pool.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_extract                      # synthetic 240-page PDF
+    python -m benchmarks.bench_extract thesis.pdf --workers 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from backend import extraction, paper_ingestion
+from backend.paper_ingestion import extract_pdf, extract_text_from_pdf
+
+LOREM = (
+    "Deep neural networks have achieved remarkable results across a wide range of tasks. "
+    "We study the scaling behaviour of attention-based models under varying compute budgets. "
+) * 12
+
+
+def synthetic_pdf(num_pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(num_pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"{i + 1} Section {i + 1}\n\n{LOREM}", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def time_serial(pdf_path: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extract_text_from_pdf(pdf_path)
+        best = min(best, time.perf_counter() - start)
+    return best, result["numPages"]
+
+
+async def time_parallel(pdf_path: str, workers: int, repeat: int) -> float:
+    extraction.shutdown_pool()
+    extraction.PARSE_WORKERS = workers
+    await extract_pdf(pdf_path)  # warm-up: spawns the workers and imports PyMuPDF in each
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await extract_pdf(pdf_path)
+        best = min(best, time.perf_counter() - start)
+    extraction.shutdown_pool()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF to parse (default: generate a synthetic one)")
+    parser.add_argument("--pages", type=int, default=240, help="pages in the synthetic PDF")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts to try")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    # Like the app, workers open the PDF from a file path
+    pdf_path = args.pdf
+    if not pdf_path:
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(synthetic_pdf(args.pages))
+
+    # Force the page-parallel path regardless of document size
+    paper_ingestion.PARALLEL_MIN_PAGES = 1
+
+    serial, num_pages = time_serial(pdf_path, args.repeat)
+    print(f"{num_pages} pages, {os.path.getsize(pdf_path) / 1e6:.1f} MB\n")
+    print(f"{'mode':<22}{'seconds':>10}{'pages/sec':>12}{'speedup':>10}")
+    print(f"{'serial (in-process)':<22}{serial:>10.3f}{num_pages / serial:>12.1f}{1.0:>10.2f}")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        elapsed = asyncio.run(time_parallel(pdf_path, workers, args.repeat))
+        label = f"pool, {workers} worker{'s' if workers > 1 else ''}"
+        print(f"{label:<22}{elapsed:>10.3f}{num_pages / elapsed:>12.1f}{serial / elapsed:>10.2f}")
+
+    if not args.pdf:
+        os.unlink(pdf_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark LLM backends: time-to-first-token and total latency under concurrent requests.
+
+Run from the repo root. The fake backend needs no network or credentials:
+
+    python -m benchmarks.bench_llm                                   # fake only
+    python -m benchmarks.bench_llm --backends fake,cli,http --requests 20 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from backend.http_client import close_client
+from backend.llm_backends import BACKENDS, FakeBackend
+
+PARAGRAPH = (
+    "We propose a method for efficient long-context reasoning and evaluate it on standard benchmarks. "
+)
+
+
+async def run_one(backend, prompt: str) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    first = None
+    chars = 0
+    async for text in backend.stream(prompt):
+        if first is None:
+            first = time.perf_counter() - start
+        chars += len(text)
+    return first or 0.0, time.perf_counter() - start, chars
+
+
+async def bench(backend, prompt: str, requests: int, concurrency: int) -> dict:
+    await backend.start()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with slots:
+            return await run_one(backend, prompt)
+
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(limited() for _ in range(requests)))
+        wall = time.perf_counter() - start
+    finally:
+        await backend.close()
+        await close_client()
+
+    ttft = sorted(r[0] for r in results)
+    total = sorted(r[1] for r in results)
+    return {
+        "ttft_p50": statistics.median(ttft),
+        "ttft_p95": ttft[int(0.95 * (len(ttft) - 1))],
+        "total_p50": statistics.median(total),
+        "req_per_sec": requests / wall,
+        "chars_per_sec": sum(r[2] for r in results) / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="fake", help=f"comma-separated, from: {', '.join(BACKENDS)}")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--prompt-chars", type=int, default=20000, help="approximate prompt size")
+    parser.add_argument("--fake-first-token-ms", type=float, default=0, help="simulated model latency for fake")
+    args = parser.parse_args()
+
+    prompt = "Summarize this paper:\n\n" + PARAGRAPH * (args.prompt_chars // len(PARAGRAPH) + 1)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {len(prompt)} char prompt\n")
+    print(f"{'backend':<10}{'ttft p50':>10}{'ttft p95':>10}{'total p50':>11}{'req/s':>9}{'chars/s':>10}")
+    for name in args.backends.split(","):
+        if name == "fake":
+            backend = FakeBackend(first_token_ms=args.fake_first_token_ms)
+        else:
+            backend = BACKENDS[name]()
+        r = asyncio.run(bench(backend, prompt, args.requests, args.concurrency))
+        print(
+            f"{name:<10}{r['ttft_p50']:>10.3f}{r['ttft_p95']:>10.3f}{r['total_p50']:>11.3f}"
+            f"{r['req_per_sec']:>9.2f}{r['chars_per_sec']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
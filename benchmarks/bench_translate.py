@@ -0,0 +1,98 @@
+"""Benchmark translation engines on the same paper: outline latency, first section, total time and throughput.
+
+Run from the repo root. The dictionary engine needs no network; `llm` uses PAPER_READER_LLM_BACKEND
+(set it to `fake` for an offline run):
+
+    python -m benchmarks.bench_translate                                   # dictionary only
+    python -m benchmarks.bench_translate paper.pdf --engines google,llm,dictionary --concurrency 8
+
+Each engine runs twice against an empty translation memory: "cold" measures the engine itself, "warm"
+the same paper again with its segments remembered.
+"""
+
+import argparse
+import asyncio
+import time
+
+from backend import translation_memory
+from backend.http_client import close_client
+from backend.llm_backends import start_backend, close_backend
+from backend.translation_memory import TranslationMemory
+from backend.translator import ENGINES, get_engine, translate_headings, translate_sections
+
+HEADINGS = [
+    "Abstract", "Introduction", "Related Work", "Background", "Method", "Model Architecture", "Training",
+    "Experimental Setup", "Datasets", "Baselines", "Results", "Ablation Study", "Analysis", "Discussion",
+    "Limitations", "Conclusion",
+]
+
+PARAGRAPH = (
+    "We propose a method for efficient long-context reasoning in neural networks. Our experiments show "
+    "that the model improves accuracy over strong baselines while reducing inference cost. "
+)
+
+
+def synthetic_sections(count: int, paragraphs: int) -> list[dict]:
+    return [
+        {"heading": f"{i + 1} {HEADINGS[i % len(HEADINGS)]}", "content": "\n\n".join([PARAGRAPH * 4] * paragraphs)}
+        for i in range(count)
+    ]
+
+
+async def run_once(engine, sections: list[dict], target: str, concurrency: int) -> dict:
+    start = time.perf_counter()
+    headings = await translate_headings([s["heading"] for s in sections], target, engine=engine)
+    outline = time.perf_counter() - start
+    first = None
+    async for _ in translate_sections(sections, target, concurrency, headings=headings, engine=engine):
+        if first is None:
+            first = time.perf_counter() - start
+    return {"outline": outline, "first": first or 0.0, "total": time.perf_counter() - start}
+
+
+async def bench(name: str, sections: list[dict], target: str, concurrency: int) -> tuple[dict, dict]:
+    engine = get_engine(name)
+    if name == "llm":
+        await start_backend()
+    # A fresh, process-local memory so earlier runs (or the app's data dir) don't count as hits
+    translation_memory._memory = TranslationMemory(":memory:")
+    try:
+        cold = await run_once(engine, sections, target, concurrency)
+        warm = await run_once(engine, sections, target, concurrency)
+    finally:
+        if name == "llm":
+            await close_backend()
+        await close_client()
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="paper to translate (default: a synthetic one)")
+    parser.add_argument("--engines", default="dictionary", help=f"comma-separated, from: {', '.join(ENGINES)}")
+    parser.add_argument("--target", default="zh-CN")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sections", type=int, default=30, help="sections in the synthetic paper")
+    parser.add_argument("--paragraphs", type=int, default=4, help="paragraphs per synthetic section")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from backend.paper_ingestion import extract_text_from_pdf
+
+        sections = extract_text_from_pdf(args.pdf)["sections"]
+    else:
+        sections = synthetic_sections(args.sections, args.paragraphs)
+    chars = sum(len(s["heading"]) + len(s["content"]) for s in sections)
+
+    print(f"{len(sections)} sections, {chars / 1000:.0f}k chars, concurrency {args.concurrency}\n")
+    print(f"{'engine':<12}{'outline':>9}{'first':>9}{'total':>9}{'chars/s':>10}{'warm':>9}")
+    for name in args.engines.split(","):
+        cold, warm = asyncio.run(bench(name, sections, args.target, args.concurrency))
+        print(
+            f"{name:<12}{cold['outline']:>9.3f}{cold['first']:>9.3f}{cold['total']:>9.3f}"
+            f"{chars / cold['total']:>10.0f}{warm['total']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-import { loadPaper, streamSummarize, streamExtract, streamTranslate, streamChat } from './api.js';
+import { loadPaperStream, streamAnalyze, streamTranslate, streamChat } from './api.js';
 import { createStreamTarget, addChatMessage, updateLastAssistantMessage, showToast, setLoading, renderMarkdown } from './components.js';
 
-const state = { paperId: null, paper: null, chatHistory: [], pdfDoc: null, zoom: 1.0, summaryDone: false, keypointsDone: false, outlineOpen: true };
+const state = { paperId: null, paper: null, chatHistory: [], chatSessionId: null, pdfDoc: null, zoom: 1.0, analysisDone: false, outlineOpen: true };
 
 document.addEventListener('DOMContentLoaded', () => {
   initPaperLoading();
@@ -46,12 +46,38 @@ async function handleLoad(url) {
   setLoading(true, 'Loading paper...');
 
   try {
-    const paper = await loadPaper(url);
+    // Metadata and sections stream in while the PDF is still downloading / parsing
+    let shown = false;
+    const streamed = [];
+    const showShell = () => {
+      if (shown) return;
+      shown = true;
+      state.paperId = null;
+      document.getElementById('empty-state').classList.add('hidden');
+      document.getElementById('main-content').classList.remove('hidden');
+      document.getElementById('btn-translate').disabled = true;
+      document.getElementById('btn-chat-toggle').disabled = true;
+      document.getElementById('pdf-viewer').innerHTML = '';
+    };
+    const paper = await loadPaperStream(url, {
+      onMetadata: meta => {
+        showShell();
+        showMetadata(meta);
+        document.getElementById('pdf-title').textContent = meta.title || 'PDF';
+        setLoading(true, 'Downloading PDF...');
+      },
+      onSections: (sections, pagesDone, numPages) => {
+        showShell();
+        streamed.push(...sections);
+        populateOutline(streamed);
+        setLoading(true, `Parsing PDF... ${pagesDone} / ${numPages} pages`);
+      },
+    });
     state.paperId = paper.id;
     state.paper = paper;
     state.chatHistory = [];
-    state.summaryDone = false;
-    state.keypointsDone = false;
+    state.chatSessionId = null;
+    state.analysisDone = false;
 
     document.getElementById('empty-state').classList.add('hidden');
     document.getElementById('main-content').classList.remove('hidden');
@@ -219,32 +245,35 @@ function initPaneTabs() {
       tab.classList.add('active');
       const pane = tab.dataset.pane;
       document.getElementById(`pane-${pane}`).classList.add('active');
-      if (pane === 'summary' && !state.summaryDone && state.paperId) autoSummarize();
-      if (pane === 'keypoints' && !state.keypointsDone && state.paperId) autoExtract();
+      if ((pane === 'summary' || pane === 'keypoints') && !state.analysisDone && state.paperId) autoAnalyze();
     });
   });
 }
 
-async function autoSummarize() {
-  state.summaryDone = true;
-  const target = createStreamTarget('pane-summary');
+// Summary and key points come from one LLM call, so opening either tab fills both panes
+async function autoAnalyze() {
+  state.analysisDone = true;
+  const targets = { summary: createStreamTarget('pane-summary'), keypoints: createStreamTarget('pane-keypoints') };
+  const each = fn => Object.entries(targets).forEach(([channel, target]) => fn(target, channel));
+  // Notes on each part of a long paper, shown in paper order until the final answer starts streaming
+  const notes = [];
+  const onProgress = (done, total, part) => {
+    if (part) notes[part.index] = `### Part ${part.index + 1} of ${total}\n\n${part.notes.trim()}`;
+    const status = `*Reading the paper... ${done} / ${total} parts*`;
+    targets.summary.update([status, ...notes.filter(Boolean)].join('\n\n'));
+    targets.keypoints.update(status);
+  };
   try {
-    await streamSummarize(state.paperId, {
-      onChunk: (_, full) => target.update(full),
-      onDone: full => target.done(full),
+    await streamAnalyze(state.paperId, {
+      onQueue: pos => each(target => target.update(`*Waiting for a free slot (#${pos} in queue)...*`)),
+      onProgress,
+      onChunk: (channel, _, full) => targets[channel].update(full),
+      onDone: full => each((target, channel) => target.done(full[channel])),
     });
-  } catch (err) { target.done(`Error: ${friendlyError(err)}`); state.summaryDone = false; }
-}
-
-async function autoExtract() {
-  state.keypointsDone = true;
-  const target = createStreamTarget('pane-keypoints');
-  try {
-    await streamExtract(state.paperId, {
-      onChunk: (_, full) => target.update(full),
-      onDone: full => target.done(full),
-    });
-  } catch (err) { target.done(`Error: ${friendlyError(err)}`); state.keypointsDone = false; }
+  } catch (err) {
+    each(target => target.done(`Error: ${friendlyError(err)}`));
+    state.analysisDone = false;
+  }
 }
 
 // ===== Actions =====
@@ -253,13 +282,19 @@ function initActions() {
     if (!state.paperId) return;
     activatePane('translation');
     const lang = document.getElementById('translate-lang').value;
+    const engine = document.getElementById('translate-engine').value;
     const target = createStreamTarget('pane-translation');
     const btn = document.getElementById('btn-translate');
     btn.disabled = true;
     btn.textContent = 'Translating...';
+    // The translated outline arrives first; headings not yet translated in full show as pending
+    let outline = [];
+    let received = 0;
+    const pending = () => outline.slice(received).map(h => `## ${h}\n\n*Translating...*\n\n`).join('');
     try {
-      await streamTranslate(state.paperId, lang, {
-        onChunk: (_, full) => target.update(full),
+      await streamTranslate(state.paperId, lang, engine, {
+        onOutline: headings => { outline = headings; target.update(pending()); },
+        onChunk: (_, full) => { received++; target.update(full + pending()); },
         onDone: full => { target.done(full); btn.disabled = false; btn.textContent = 'Translate'; },
       });
     } catch (err) {
@@ -290,6 +325,7 @@ function initChat() {
     if (state.chatHistory.length === 0) return;
     if (!confirm('Clear all chat messages?')) return;
     state.chatHistory = [];
+    state.chatSessionId = null;
     document.getElementById('chat-messages').innerHTML = '<div class="chat-empty"><p>Ask about the paper</p></div>';
   });
   document.querySelectorAll('.suggestion').forEach(btn => {
@@ -307,7 +343,9 @@ async function sendMessage() {
   addChatMessage('user', q);
   addChatMessage('assistant', '', { streaming: true });
   try {
-    await streamChat(state.paperId, q, state.chatHistory, {
+    await streamChat(state.paperId, q, state.chatSessionId, state.chatHistory, {
+      onSession: id => { state.chatSessionId = id; },
+      onQueue: pos => updateLastAssistantMessage(`*Waiting for a free slot (#${pos} in queue)...*`),
       onChunk: (_, full) => updateLastAssistantMessage(full),
       onDone: full => {
         updateLastAssistantMessage(full, { done: true });
@@ -2,6 +2,19 @@
 
 const API_BASE = '';  // Same origin
 
+// Stable per-browser ID so the server can queue LLM work fairly between users
+const CLIENT_ID = (() => {
+  // crypto.randomUUID only exists on HTTPS or localhost, not on http://<server-ip>:8899
+  const fresh = () => crypto.randomUUID?.() ?? Date.now().toString(36) + Math.random().toString(36).slice(2);
+  try {
+    const id = localStorage.getItem('paper-reader-client-id') || fresh();
+    localStorage.setItem('paper-reader-client-id', id);
+    return id;
+  } catch {
+    return fresh();  // storage disabled (private mode, blocked cookies): one ID per page load
+  }
+})();
+
 /**
  * Load a paper by URL. Returns paper metadata.
  */
@@ -21,24 +34,38 @@ export async function loadPaper(url) {
 }
 
 /**
- * Generic SSE streaming consumer.
- * Calls onChunk(token, fullText) for each token, onDone(fullText) when complete.
+ * Load a paper by URL, streaming progress. Calls onMetadata(meta) once arXiv metadata is known and
+ * onSections(sections, pagesDone, numPages) as pages are parsed. Resolves with the loaded paper.
+ */
+export async function loadPaperStream(url, { onMetadata, onSections } = {}) {
+  let paper = null;
+  for await (const json of postSSE('/api/paper/load/stream', { url })) {
+    if (json.error) throw new Error(json.error);
+    if (json.metadata) onMetadata?.(json.metadata);
+    if (json.sections) onSections?.(json.sections, json.pagesDone, json.numPages);
+    if (json.paper) paper = json.paper;
+  }
+  if (!paper) throw new Error('Failed to load paper');
+  return paper;
+}
+
+/**
+ * POST and yield each parsed JSON event of the SSE response until [DONE].
  */
-async function consumeSSE(url, body, { onChunk, onDone } = {}) {
+async function* postSSE(url, body) {
   const res = await fetch(`${API_BASE}${url}`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: { 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID },
     body: JSON.stringify(body),
   });
 
   if (!res.ok) {
     const err = await res.json().catch(() => ({ detail: res.statusText }));
-    throw new Error(err.detail || `Request failed (${res.status})`);
+    throw Object.assign(new Error(err.detail || `Request failed (${res.status})`), { status: res.status });
   }
 
   const reader = res.body.getReader();
   const decoder = new TextDecoder();
-  let full = '';
   let buffer = '';
 
   while (true) {
@@ -52,18 +79,39 @@ async function consumeSSE(url, body, { onChunk, onDone } = {}) {
     for (const line of lines) {
       if (!line.startsWith('data: ')) continue;
       const data = line.slice(6).trim();
-      if (data === '[DONE]') break;
-
-      try {
-        const json = JSON.parse(data);
-        if (json.error) throw new Error(json.error);
-        if (json.token) {
-          full += json.token;
-          onChunk?.(json.token, full);
-        }
-      } catch (e) {
-        if (e.message && !e.message.includes('JSON')) throw e;
-      }
+      if (data === '[DONE]') return;
+
+      let json;
+      try { json = JSON.parse(data); } catch { continue; }
+      yield json;
+    }
+  }
+}
+
+function mapPart(map) {
+  return 'notes' in map ? { index: map.index, notes: map.notes } : undefined;
+}
+
+/**
+ * Generic SSE streaming consumer.
+ * Calls onChunk(token, fullText) for each token, onDone(fullText) when complete,
+ * onQueue(position) while the request waits for an LLM slot, and
+ * onProgress(done, total, part) while the parts of a long paper are being read, where part is
+ * { index, notes } for the part that just finished (notes to show until the final answer starts), and
+ * onSession(sessionId) when the server opens a chat session, and
+ * onOutline(headings) when a translation sends its translated headings ahead of the sections.
+ */
+async function consumeSSE(url, body, { onChunk, onDone, onQueue, onProgress, onSession, onOutline } = {}) {
+  let full = '';
+  for await (const json of postSSE(url, body)) {
+    if (json.error) throw new Error(json.error);
+    if (json.outline) onOutline?.(json.outline);
+    if (json.session) onSession?.(json.session);
+    if (json.queue) onQueue?.(json.queue);
+    if (json.map) onProgress?.(json.map.done, json.map.total, mapPart(json.map));
+    if (json.token) {
+      full += json.token;
+      onChunk?.(json.token, full);
     }
   }
 
@@ -79,10 +127,40 @@ export function streamExtract(paperId, callbacks) {
   return consumeSSE('/api/paper/extract', { paper_id: paperId }, callbacks);
 }
 
-export function streamTranslate(paperId, targetLang, callbacks) {
-  return consumeSSE('/api/paper/translate', { paper_id: paperId, target_lang: targetLang }, callbacks);
+/**
+ * Summary and key points from one LLM call. Events arrive tagged with a channel;
+ * calls onChunk(channel, token, fullText) per token and onDone({ summary, keypoints }) at the end.
+ */
+export async function streamAnalyze(paperId, { onChunk, onDone, onQueue, onProgress } = {}) {
+  const full = { summary: '', keypoints: '' };
+  for await (const json of postSSE('/api/paper/analyze', { paper_id: paperId })) {
+    if (json.error) throw new Error(json.error);
+    if (json.queue) onQueue?.(json.queue);
+    if (json.map) onProgress?.(json.map.done, json.map.total, mapPart(json.map));
+    if (json.token && json.channel in full) {
+      full[json.channel] += json.token;
+      onChunk?.(json.channel, json.token, full[json.channel]);
+    }
+  }
+  onDone?.(full);
+  return full;
+}
+
+export function streamTranslate(paperId, targetLang, engine, callbacks) {
+  return consumeSSE('/api/paper/translate', { paper_id: paperId, target_lang: targetLang, engine }, callbacks);
 }
 
-export function streamChat(paperId, question, history, callbacks) {
-  return consumeSSE('/api/paper/chat', { paper_id: paperId, question, history }, callbacks);
+/**
+ * The server keeps the conversation: pass the sessionId from the previous turn's
+ * onSession(sessionId) callback (null starts a new conversation). If the server no longer
+ * has that session (expired or restarted), the question is resent with `history` to rebuild it.
+ */
+export async function streamChat(paperId, question, sessionId, history, callbacks) {
+  const body = { paper_id: paperId, question, session_id: sessionId };
+  try {
+    return await consumeSSE('/api/paper/chat', body, callbacks);
+  } catch (err) {
+    if (err.status !== 409 || !history.length) throw err;
+    return consumeSSE('/api/paper/chat', { ...body, session_id: null, history }, callbacks);
+  }
 }